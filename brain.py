@@ -1,12 +1,14 @@
 import os
 import json
 import datetime
-import re
 import sys
+import uuid
 from dotenv import load_dotenv
 from supabase import create_client
-from sentence_transformers import SentenceTransformer
-from groq import Groq
+from llm_gateway import get_gateway, VISION
+from retrieval import HybridRetriever, normalize_filters
+from sql_guard import GuardedSQLExecutor, SQLRejected, normalize_sql
+from model_server import get_embedder
 from logger import logger
 
 # Fix Unicode encoding for Windows console
@@ -19,6 +21,7 @@ load_dotenv()
 class BraavBrain:
     def __init__(self, url, key):
         logger.info("🧠 Initializing BraavBrain...")
+        self.session_id = uuid.uuid4().hex
         try:
             self.db = create_client(url, key)
             logger.info("📡 Supabase connected successfully.")
@@ -26,29 +29,41 @@ class BraavBrain:
             logger.error(f"❌ Failed to connect to Supabase: {e}")
         
         try:
-            self.embedder = SentenceTransformer("all-MiniLM-L6-v2")
-            logger.info("✅ Embeddings model loaded (SentenceTransformer)")
+            self.embedder = get_embedder("all-MiniLM-L6-v2")
+            logger.info("✅ Embeddings model ready")
         except Exception as e:
             logger.error(f"❌ Failed to load SentenceTransformer: {e}")
         
+        # A cold llama3.2-vision load alone can take well over the default chat deadline.
+        self.vision_deadline = float(os.getenv("BRAAV_VISION_DEADLINE", "120"))
         try:
-            self.llm = Groq(api_key=os.getenv("GROQ_API_KEY"))
-            logger.info("✅ LLM client initialized (Groq)")
+            self.llm = get_gateway()
+            logger.info("✅ LLM gateway attached")
         except Exception as e:
-            logger.error(f"❌ Failed to initialize Groq client: {e}")
+            logger.error(f"❌ Failed to initialize LLM gateway: {e}")
 
         self.SCHEMA_MAP = """
         SYSTEM DESIGN (THE DRAWERS):
         1. thoughts: Personal journal/diary entries & 'Macha' thoughts.
            Columns: content (text), created_at (timestamp), embedding (vector), metadata (jsonb)
         2. interactions: Historical chat memory between User and ORB.
-           Columns: content (text), category (text), created_at (timestamp), embedding (vector)
+           Columns: content (text), category (text), session_id (text), created_at (timestamp), embedding (vector)
         3. files_in_void: Digitized PDF/text from external files.
            Columns: content (text), name (text), created_at (timestamp), embedding (vector)
-        4. query_logs: Audit trail of ORB's technical execution.
+        4. interaction_summaries: Rolled-up summaries of older chat memory.
+           Columns: content (text), topic (text), period_start (timestamp), period_end (timestamp), embedding (vector)
+        5. query_logs: Audit trail of ORB's technical execution.
            Columns: user_query (text), agent_plan (jsonb), tool_outputs (text), ai_response (text)
+        Tables 1-4 also have fts (tsvector, GIN indexed). For exact names, dates or titles use
+           WHERE fts @@ websearch_to_tsquery('english', '<words>') -- never ILIKE '%...%'.
         """
         logger.info("📋 System Manifesto loaded (drawer schema ready)")
+        self.retriever = HybridRetriever(
+            self.db, self.get_embedding,
+            index_mode=os.getenv("BRAAV_VECTOR_INDEX", "full"),
+            rerank_factor=int(os.getenv("BRAAV_RERANK_FACTOR", "4")),
+        )
+        self.sql = GuardedSQLExecutor(self.db)
 
     def handle_query(self, user_query):
         self.log_interaction(user_query, "user_input")
@@ -61,26 +76,19 @@ class BraavBrain:
         try:
             vector = self.get_embedding(content)
             self.db.table("interactions").insert({
-                "content": content, "category": category,
+                "content": content, "category": category, "session_id": self.session_id,
                 "embedding": vector, "created_at": datetime.datetime.utcnow().isoformat()
             }).execute()
+            self.sql.invalidate("interactions")
             logger.debug(f"📡 Interaction Logged: {category}")
         except Exception as e:
             logger.error(f"❌ DB Error (Interaction): {e}")
 
     def is_sql_safe(self, sql: str):
-        sql_clean = sql.strip().replace("```sql", "").replace("```", "").rstrip(';')
-        sql_upper = sql_clean.upper()
-        banned = ["DELETE", "DROP", "TRUNCATE", "ALTER", "UPDATE", "INSERT"]
-        if any(b in sql_upper for b in banned):
-            return False, "FORBIDDEN: Destructive SQL."
-        
-        allowed_tables = ["thoughts", "interactions", "files_in_void", "query_logs"]
-        tables_found = re.findall(r'(?:from|join)\s+([a-zA-Z_][a-zA-Z0-9_]*)', sql_clean.lower())
-        if not all(t in allowed_tables for t in tables_found):
-            return False, f"FORBIDDEN: Unauthorized table access."
-        
-        if "LIMIT" not in sql_upper: sql_clean += " LIMIT 50"
+        try:
+            sql_clean, _ = normalize_sql(sql)
+        except SQLRejected as e:
+            return False, str(e)
         return True, sql_clean
 
     def agent_query(self, user_query):
@@ -97,19 +105,23 @@ class BraavBrain:
             PROBLEM: {user_query}
             RECOLLECTION: {context}
             PREVIOUS ERROR: {last_error}
+            TODAY: {datetime.date.today().isoformat()}
             TASK: Decide if we need specific facts (SQL) or general vibes (SEMANTIC).
+            If the question is scoped (a time window, only diary entries, unprocessed thoughts, a project),
+            fill "filters"; leave a key null when the question doesn't restrict it. "until" is the last
+            day included. source_type: "dairy_entry" = watched diary files, "vision_scan" = scanned images.
             JSON ONLY: {{
                 "consideration": "Briefly explain WHY you are choosing SQL or Semantic.",
                 "approach": "sql"|"semantic", 
-                "sql_intent": "explanation"
+                "sql_intent": "explanation",
+                "filters": {{"since": "YYYY-MM-DD"|null, "until": "YYYY-MM-DD"|null,
+                            "source_type": "dairy_entry"|"vision_scan"|null, "is_processed": true|false|null,
+                            "project_id": "uuid"|null}}
             }}
             """
             try:
-                plan_res = self.llm.chat.completions.create(
-                    messages=[{"role": "system", "content": plan_prompt}],
-                    model="llama-3.1-8b-instant", response_format={"type": "json_object"}
-                )
-                plan = json.loads(plan_res.choices[0].message.content)
+                plan_res = self.llm.chat([{"role": "system", "content": plan_prompt}], json_mode=True)
+                plan = json.loads(plan_res)
                 logger.warning(f"🤔 ORB CONSIDERATION: {plan.get('consideration', 'No reasoning provided.')}")
                 logger.info(f"📝 NODE 1 (PLAN): {plan['approach'].upper()} | Intent: {plan.get('sql_intent', 'N/A')}")
 
@@ -117,10 +129,7 @@ class BraavBrain:
                 if plan["approach"] == "sql":
                     logger.info("🛠️ Step 2: Generating and Validating SQL...")
                     gen_prompt = f"SYSTEM: {self.SCHEMA_MAP}\nINTENT: {plan['sql_intent']}\nGENERATE READ-ONLY SQL. NO EXPLANATION."
-                    raw_sql = self.llm.chat.completions.create(
-                        messages=[{"role": "user", "content": gen_prompt}], 
-                        model="llama-3.1-8b-instant"
-                    ).choices[0].message.content.strip()
+                    raw_sql = self.llm.chat([{"role": "user", "content": gen_prompt}]).strip()
                     
                     safe, final_sql = self.is_sql_safe(raw_sql)
                     if not safe: 
@@ -128,17 +137,19 @@ class BraavBrain:
                         raise ValueError(final_sql)
                     
                     logger.warning(f"🔍 NODE 2 (SQL EXECUTE): {final_sql}")
-                    data = self.db.rpc("execute_sql", {"query_text": final_sql}).execute().data
+                    _, data = self.sql.execute(final_sql)
                     logger.info(f"📊 DATA RETRIEVED: Found {len(data) if data else 0} records.")
                 else:
-                    logger.info("🧠 Step 2: Proceeding with Semantic Retrieval context only.")
+                    filters = normalize_filters(plan.get("filters"))
+                    if filters:
+                        logger.info(f"🧠 Step 2: Re-running scoped semantic retrieval with {filters}")
+                        data = self.retrieve_context(user_query, filters)
+                    else:
+                        logger.info("🧠 Step 2: Proceeding with Semantic Retrieval context only.")
 
                 logger.info("✍️ Step 3: Synthesizing Macha-style response...")
                 sum_prompt = f"DATA: {data}\nUSER: {user_query}\nAnswer as a helpful peer. No internal logic mentions."
-                answer = self.llm.chat.completions.create(
-                    messages=[{"role": "system", "content": sum_prompt}], 
-                    model="llama-3.1-8b-instant"
-                ).choices[0].message.content
+                answer = self.llm.chat([{"role": "system", "content": sum_prompt}])
                 
                 self.log_query(user_query, plan, data, answer)
                 self.log_interaction(answer, "ai_response")
@@ -152,18 +163,10 @@ class BraavBrain:
 
         return "❌ All attempts failed. Check terminal for schema collisions."
 
-    def retrieve_context(self, query: str):
-        logger.debug(f"🧠 Retrieving semantic context for: {query[:50]}...")
-        embedding = self.get_embedding(query)
-        vector_str = f"'{[float(x) for x in embedding]}'"
-        def run(table):
-            sql = f"SELECT content FROM {table} ORDER BY embedding <-> {vector_str} LIMIT 3"
-            try:
-                return self.db.rpc("execute_sql", {"query_text": sql}).execute().data or []
-            except Exception as e:
-                logger.warning(f"⚠️ Vector search failed on {table}: {e}")
-                return []
-        return {"thoughts": run("thoughts"), "interactions": run("interactions")}
+    def retrieve_context(self, query: str, filters=None):
+        logger.debug(f"🧠 Retrieving hybrid context for: {query[:50]}...")
+        # interactions is tiered: interaction_summaries is consulted when recent memory is thin
+        return self.retriever.search(query, tables=("thoughts", "interactions"), k=3, filters=filters)
 
     def log_query(self, user_query, plan, tool_output, response):
         try:
@@ -172,6 +175,7 @@ class BraavBrain:
                 "tool_outputs": str(tool_output), "ai_response": response,
                 "created_at": datetime.datetime.utcnow().isoformat()
             }).execute()
+            self.sql.invalidate("query_logs")
         except Exception as e:
             logger.error(f"❌ Failed to log query to query_logs: {e}")
 
@@ -179,8 +183,30 @@ class BraavBrain:
         try:
             vector = self.get_embedding(text)
             self.db.table("thoughts").insert({"content": text, "embedding": vector, "metadata": {"is_processed": False}}).execute()
+            self.sql.invalidate("thoughts")
             logger.info(f"💡 Seeded Thought: {text[:40]}...")
             return "💡 Thought Saved"
         except Exception as e:
             logger.error(f"❌ Error seeding thought: {e}")
-            return f"Error: {e}"
\ No newline at end of file
+            return f"Error: {e}"
+
+    def vision_swallow(self, path):
+        """Describe an image with the vision model and store it as a thought."""
+        try:
+            with open(path, "rb") as img:
+                description = self.llm.chat([{
+                    "role": "user",
+                    "content": "Analyze this for my personal diary. What is happening? Summarize the mood and the activity in one punchy sentence for Macha.",
+                    "images": [img.read()],
+                }], capability=VISION, deadline=self.vision_deadline)
+            vector = self.get_embedding(description)
+            self.db.table("thoughts").insert({
+                "content": description, "embedding": vector,
+                "metadata": {"source_file": os.path.basename(path), "source_type": "vision_scan", "is_processed": False},
+            }).execute()
+            self.sql.invalidate("thoughts")
+            logger.info(f"👁️ Vision Thought: {description[:40]}...")
+            return f"VISION: {description}"
+        except Exception as e:
+            logger.error(f"❌ Error in vision swallow: {e}", exc_info=True)
+            return f"VISION ERROR: {e}"
\ No newline at end of file
@@ -1,11 +1,11 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-import ollama
 import os
 import asyncio
 from dotenv import load_dotenv
 from logger import logger
+from llm_gateway import get_gateway
 
 load_dotenv()
 
@@ -64,6 +64,10 @@ def get_brain():
     try:
         brain = BraavBrain(SUPA_URL, SUPA_KEY)
         logger.info("BraavBrain initialized.")
+        interval = os.getenv("BRAAV_CONSOLIDATE_EVERY")
+        if interval:
+            from consolidator import start_consolidation_loop, policy_from_env
+            start_consolidation_loop(brain, int(interval), **policy_from_env())
         return brain
     except BaseException as e:
         # Catch broad exceptions so the server stays up
@@ -76,7 +80,7 @@ def get_brain():
 async def chat_endpoint(request: ChatRequest):
     """Route chat requests to the BraavBrain agent loop when available.
 
-    Falls back to a simple Ollama chat if BraavBrain isn't configured.
+    Falls back to a plain chat through the LLM gateway if BraavBrain isn't configured.
     """
     current_brain = get_brain()
     if current_brain:
@@ -88,14 +92,14 @@ async def chat_endpoint(request: ChatRequest):
             logger.error(f"Error in agent: {e}", exc_info=True)
             return {"reply": f"Error in agent: {e}"}
 
-    # Fallback: return a simple Ollama reply
+    # Fallback: return a simple gateway reply (ends up on local Ollama if nothing else is configured)
     try:
-        logger.info("Falling back to Ollama chat")
-        response = ollama.chat(model='llama3', messages=[
+        logger.info("Falling back to gateway chat")
+        reply = await asyncio.to_thread(get_gateway().chat, [
             {'role': 'system', 'content': 'You are the ORB Kernel. You are assisting Macha.'},
             {'role': 'user', 'content': request.message},
         ])
-        return {"reply": response['message']['content']}
+        return {"reply": reply}
     except Exception as e:
         logger.error(f"LLM error: {e}", exc_info=True)
         return {"reply": f"LLM error: {e}"}
@@ -0,0 +1,224 @@
+"""Memory tiering: roll aged `interactions` up into `interaction_summaries`.
+
+Rows older than the age policy (or the oldest rows beyond the hot-size cap)
+are grouped by session, clustered by topic on their embeddings, summarized
+through the LLM gateway and written as embedded summary rows. The raw rows
+then move to `interactions_archive`, out of the hot HNSW index. Rows whose
+summary keeps failing are archived unsummarized so they can't stall eviction.
+"""
+import os
+import re
+import json
+import time
+import datetime
+import threading
+import numpy as np
+from dotenv import load_dotenv
+from logger import logger
+
+load_dotenv()
+
+
+def _parse_ts(value):
+    # Python 3.10's fromisoformat wants exactly 3 or 6 fractional digits and a
+    # "+HH:MM" offset; Postgres trims trailing zeros ("...30.12345+00:00") and
+    # may send "+00".
+    text = str(value).strip().replace("Z", "+00:00")
+    text = re.sub(r"\.(\d+)", lambda m: "." + m.group(1)[:6].ljust(6, "0"), text, count=1)
+    text = re.sub(r"(:\d{2}(?:\.\d+)?[+-]\d{2})$", r"\1:00", text)
+    return datetime.datetime.fromisoformat(text)
+
+
+def _parse_vector(value):
+    # PostgREST returns pgvector columns as their text form "[0.1,0.2,...]".
+    return np.asarray(json.loads(value) if isinstance(value, str) else value, dtype=np.float32)
+
+
+class MemoryConsolidator:
+    def __init__(self, brain, max_age_days=7, max_hot_rows=5000, batch_size=500,
+                 similarity=0.6, min_cluster=2, max_turns=40, max_failures=3):
+        self.brain = brain
+        self.db = brain.db
+        self.max_age = datetime.timedelta(days=max_age_days)
+        self.max_hot_rows = max_hot_rows
+        self.batch_size = batch_size
+        self.similarity = similarity
+        self.min_cluster = min_cluster
+        self.max_turns = max_turns  # cap per summary prompt
+        self.max_failures = max_failures
+        self.failures = {}  # interaction id -> failed summary attempts
+
+    def select_evictable(self):
+        """Oldest hot rows that are past the age policy or over the size cap."""
+        total = self.db.table("interactions").select("id", count="exact").limit(1).execute().count or 0
+        overflow = max(0, total - self.max_hot_rows)
+        cutoff = datetime.datetime.now(datetime.timezone.utc) - self.max_age
+
+        rows = self.db.table("interactions") \
+            .select("id, content, category, session_id, created_at, embedding") \
+            .order("created_at").limit(self.batch_size).execute().data or []
+
+        evictable = []
+        for i, row in enumerate(rows):
+            try:
+                created = _parse_ts(row["created_at"])
+            except ValueError:
+                # One odd value must not stall the pass; such a row still goes under the size cap.
+                logger.warning(f"⚠️ Unparseable created_at on interaction {row['id']}: {row['created_at']!r}")
+                if i < overflow:
+                    evictable.append(row)
+                continue
+            if created.tzinfo is None:
+                created = created.replace(tzinfo=datetime.timezone.utc)
+            if i < overflow or created < cutoff:
+                evictable.append(row)
+        logger.info(f"🗄️ Hot interactions: {total} rows, {len(evictable)} evictable this pass")
+        return evictable
+
+    def cluster(self, rows):
+        """Group rows by session, then greedily by topic (cosine to cluster centroid)."""
+        sessions = {}
+        for row in rows:
+            key = row.get("session_id") or f"day:{str(row['created_at'])[:10]}"
+            sessions.setdefault(key, []).append(row)
+
+        clusters = []
+        for session_id, members in sessions.items():
+            groups = []  # [centroid, rows]
+            for row in members:
+                vec = _parse_vector(row["embedding"]) if row.get("embedding") else None
+                if vec is not None:
+                    vec = vec / (np.linalg.norm(vec) or 1.0)
+                best, best_sim = None, self.similarity
+                for group in groups:
+                    if vec is None or group[0] is None:
+                        continue
+                    sim = float(group[0] @ vec)
+                    if sim >= best_sim:
+                        best, best_sim = group, sim
+                if best is None:
+                    groups.append([vec, [row]])
+                else:
+                    best[1].append(row)
+                    centroid = best[0] * (len(best[1]) - 1) + vec
+                    best[0] = centroid / (np.linalg.norm(centroid) or 1.0)
+
+            # Stragglers from one session are summarized together instead of one-by-one.
+            leftovers = [r for g in groups if len(g[1]) < self.min_cluster for r in g[1]]
+            for g in groups:
+                if len(g[1]) >= self.min_cluster:
+                    clusters.append((session_id, g[1]))
+            if leftovers:
+                clusters.append((session_id, leftovers))
+
+        # Keep every summary prompt bounded, however large a cluster grew.
+        return [
+            (session_id, members[i:i + self.max_turns])
+            for session_id, members in clusters
+            for i in range(0, len(members), self.max_turns)
+        ]
+
+    def summarize(self, rows):
+        transcript = "\n".join(
+            f"[{r['created_at']}] {r.get('category', '')}: {r['content']}" for r in rows
+        )
+        prompt = f"""
+        Condense these chat turns between Macha and ORB into long-term memory.
+        Keep durable facts, decisions, names and dates; drop greetings and filler.
+        TURNS:
+        {transcript}
+        JSON ONLY: {{"topic": "3-6 words", "summary": "2-5 sentences"}}
+        """
+        res = json.loads(self.brain.llm.chat([{"role": "system", "content": prompt}], json_mode=True))
+        return res.get("topic", ""), res["summary"]
+
+    def consolidate_cluster(self, session_id, rows):
+        rows = sorted(rows, key=lambda r: r["created_at"])
+        topic, summary = self.summarize(rows)
+        # The summary insert and the archive move are one transaction inside the RPC,
+        # so a failure can't leave a summary behind for rows that are still hot.
+        moved = self.db.rpc("archive_interactions", {
+            "row_ids": [r["id"] for r in rows],
+            "summary": {
+                "content": summary,
+                "topic": topic,
+                "session_id": session_id,
+                "period_start": rows[0]["created_at"],
+                "period_end": rows[-1]["created_at"],
+                "source_count": len(rows),
+                "embedding": self.brain.get_embedding(f"{topic}. {summary}"),
+            },
+        }).execute().data
+        self.brain.sql.invalidate("interactions")
+        self.brain.sql.invalidate("interaction_summaries")
+        logger.info(f"📦 Rolled {moved} interactions into a summary: {topic}")
+        return moved or 0
+
+    def run_once(self):
+        """One consolidation pass. Returns the number of hot rows archived."""
+        rows = self.select_evictable()
+        if not rows:
+            return 0
+        archived = 0
+        for session_id, members in self.cluster(rows):
+            try:
+                archived += self.consolidate_cluster(session_id, members)
+                for r in members:
+                    self.failures.pop(r["id"], None)
+            except Exception as e:
+                logger.error(f"❌ Consolidation failed for session {session_id}: {e}", exc_info=True)
+                archived += self.record_failure(members)
+        return archived
+
+    def record_failure(self, rows):
+        """Count a failed summary; archive rows unsummarized once they hit max_failures."""
+        stuck = []
+        for r in rows:
+            self.failures[r["id"]] = self.failures.get(r["id"], 0) + 1
+            if self.failures[r["id"]] >= self.max_failures:
+                stuck.append(r["id"])
+        if not stuck:
+            return 0
+        try:
+            moved = self.db.rpc("archive_interactions", {"row_ids": stuck, "summary": None}).execute().data
+        except Exception as e:
+            logger.error(f"❌ Failed to archive {len(stuck)} stuck interactions: {e}")
+            return 0
+        for row_id in stuck:
+            self.failures.pop(row_id, None)
+        self.brain.sql.invalidate("interactions")
+        logger.warning(f"🗄️ Archived {moved} interactions unsummarized after {self.max_failures} failed attempts")
+        return moved or 0
+
+
+def start_consolidation_loop(brain, interval_seconds=3600, **policy):
+    """Run MemoryConsolidator.run_once on a daemon thread every `interval_seconds`."""
+    consolidator = MemoryConsolidator(brain, **policy)
+
+    def loop():
+        while True:
+            try:
+                # Drain backlog in full batches before sleeping.
+                while consolidator.run_once() >= consolidator.batch_size // 2:
+                    pass
+            except Exception as e:
+                logger.error(f"❌ Consolidation loop error: {e}", exc_info=True)
+            time.sleep(interval_seconds)
+
+    threading.Thread(target=loop, daemon=True, name="memory-consolidator").start()
+    logger.info(f"🗄️ Memory consolidation every {interval_seconds}s")
+    return consolidator
+
+
+def policy_from_env():
+    return {
+        "max_age_days": int(os.getenv("BRAAV_HOT_MAX_AGE_DAYS", "7")),
+        "max_hot_rows": int(os.getenv("BRAAV_HOT_MAX_ROWS", "5000")),
+    }
+
+
+if __name__ == "__main__":
+    from brain import BraavBrain
+    brain = BraavBrain(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"))
+    archived = MemoryConsolidator(brain, **policy_from_env()).run_once()
+    logger.info(f"✅ Consolidation pass archived {archived} interactions")
@@ -11,8 +11,8 @@ class ChamchaExtractor:
         """Load OCR model only when needed"""
         if self.ocr_reader is None:
             logger.info("Loading EasyOCR (first use)...")
-            import easyocr
-            self.ocr_reader = easyocr.Reader(['en'])
+            from model_server import get_ocr_reader
+            self.ocr_reader = get_ocr_reader()
             logger.info("EasyOCR ready")
     
     def extract_text(self, file_path):
@@ -0,0 +1,279 @@
+"""Batch capture for the Librarian: many thoughts per LLM round-trip.
+
+A group of thoughts goes out in one structured prompt. The reply (table
+assignments plus one parameter row per thought) is validated and applied
+with `executemany` in a single SQLite transaction. Each group may also carry
+a regex that reproduces its parameter rows. Once verified against the
+batch, it is stored in `_librarian_routes`, and later inputs that match it
+skip the LLM entirely.
+"""
+import json
+import re
+import sqlite3
+from logger import logger
+
+ROUTES_TABLE = "_librarian_routes"
+INTERNAL_TABLES = {"sqlite_sequence", ROUTES_TABLE}
+IDENT = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+CHUNK_SIZE = 25  # thoughts per LLM call
+MIN_ROUTE_ROWS = 2  # a route must be confirmed by at least this many thoughts
+MIN_ANCHOR_LETTERS = 3  # fixed word a route must contain outside its capture groups
+
+
+def user_tables(conn):
+    rows = conn.execute("SELECT name FROM sqlite_master WHERE type='table'").fetchall()
+    return [r[0] for r in rows if r[0] not in INTERNAL_TABLES]
+
+
+def describe_tables(conn):
+    """{table: [columns]} for the prompt, so the LLM reuses existing buckets."""
+    return {t: [c[1] for c in conn.execute(f'PRAGMA table_info("{t}")')] for t in user_tables(conn)}
+
+
+def batch_prompt(thoughts, schema):
+    numbered = "\n".join(f"{i}. {t}" for i, t in enumerate(thoughts))
+    return f"""
+    You are B'Raav, the Autonomous Librarian.
+    Existing Tables (name: columns): {json.dumps(schema)}
+    Thoughts (index. text):
+    {numbered}
+
+    Task: Assign EVERY thought to an existing table or a NEW one. Group thoughts that share a table.
+    For each group give one parameterized INSERT (use ? placeholders) and one params row per thought.
+    If the thoughts in a group follow a fixed shape, add "pattern": a Python regex whose capture
+    groups, in order, reproduce each params row exactly from the thought text; otherwise null.
+    Return ONLY JSON:
+    {{
+        "groups": [{{
+            "explanation": "Brief reason",
+            "table_name": "name",
+            "new_table_sql": "CREATE TABLE ... or null",
+            "insert_sql": "INSERT INTO name (...) VALUES (?, ...)",
+            "items": [thought indexes],
+            "rows": [[values for each item, same order]],
+            "pattern": "regex or null"
+        }}]
+    }}
+    """
+
+
+def _placeholders(sql):
+    return sql.count("?")
+
+
+def validate_group(group, n_thoughts, existing):
+    """Return a cleaned group or raise ValueError."""
+    table = str(group.get("table_name", ""))
+    if not IDENT.match(table) or table in INTERNAL_TABLES:
+        raise ValueError(f"Invalid table name: {table!r}")
+
+    create = group.get("new_table_sql") or None
+    if create and table in existing:
+        create = None  # already there; reuse it
+    if create:
+        create = create.strip().rstrip(";")
+        if not re.match(rf'^CREATE\s+TABLE\s+(IF\s+NOT\s+EXISTS\s+)?"?{table}"?\s*\(', create, re.I) \
+                or ";" in create:
+            raise ValueError(f"Rejected CREATE for {table}")
+    elif table not in existing:
+        raise ValueError(f"Table {table} does not exist and no CREATE was given")
+
+    insert = str(group.get("insert_sql", "")).strip().rstrip(";")
+    if not re.match(rf'^INSERT\s+INTO\s+"?{table}"?\s*[\s(]', insert, re.I) or ";" in insert:
+        raise ValueError(f"Rejected INSERT for {table}")
+
+    items, rows = group.get("items") or [], group.get("rows") or []
+    if len(items) != len(rows) or not rows:
+        raise ValueError(f"{table}: items/rows mismatch")
+    width = _placeholders(insert)
+    for i, row in zip(items, rows):
+        if not isinstance(i, int) or not 0 <= i < n_thoughts:
+            raise ValueError(f"{table}: bad item index {i!r}")
+        if not isinstance(row, list) or len(row) != width:
+            raise ValueError(f"{table}: row for item {i} has {len(row) if isinstance(row, list) else '?'} "
+                             f"values, INSERT expects {width}")
+
+    return {
+        "table_name": table, "new_table_sql": create, "insert_sql": insert,
+        "items": items, "rows": [tuple(r) for r in rows],
+        "pattern": group.get("pattern") or None,
+        "explanation": group.get("explanation", ""),
+    }
+
+
+def _has_anchor(pattern, min_letters=MIN_ANCHOR_LETTERS):
+    """True if the pattern has a literal word outside its capture groups.
+
+    `(.*)`, `(\\w+) (\\d+)` or `(.+), (.+)` would match almost anything; a route
+    needs fixed wording such as `Spent (\\d+) on (.+)` (a run of at least
+    `min_letters` letters, not optional) to be trusted with future inputs.
+    """
+    literal, groups, i, n = [], [], 0, len(pattern)  # groups: [(capturing, start in literal)]
+    span = 1  # how many trailing `literal` entries a following ?/*/{0,} makes optional
+
+    def lit(ch):
+        literal.append(ch if not any(cap for cap, _ in groups) else " ")
+
+    while i < n:
+        c = pattern[i]
+        if c in "?*" or pattern.startswith("{0", i):
+            literal[len(literal) - span:] = [" "] * span
+        if c == "\\":
+            nxt = pattern[i + 1:i + 2]
+            lit(nxt if nxt and not nxt.isalnum() else " ")  # \d, \w, \b... are not text
+            i += 2
+        elif c == "[":
+            close = pattern.find("]", i + 2)
+            literal.append(" ")
+            i = n if close < 0 else close + 1
+        elif c == "{":
+            close = pattern.find("}", i)
+            literal.append(" ")
+            i = n if close < 0 else close + 1
+        elif c == "(":
+            literal.append(" ")
+            if pattern.startswith("(?:", i):
+                groups.append((False, len(literal)))
+                i += 3
+            elif pattern.startswith("(?P<", i):
+                groups.append((True, len(literal)))
+                i = pattern.find(">", i) + 1 or n
+            else:
+                # Plain captures and lookarounds/flags alike: nothing inside counts as an anchor.
+                groups.append((True, len(literal)))
+                i += 1
+        elif c == ")":
+            opened = groups.pop()[1] if groups else len(literal)
+            literal.append(" ")
+            span = len(literal) - opened + 1  # a quantifier after `)` applies to the whole group
+            i += 1
+            continue
+        elif c == "|" and not groups:
+            literal.append("\n")  # top-level alternative: every branch needs its own anchor
+            i += 1
+        elif c in ".^$+|?*":
+            literal.append(" ")
+            i += 1
+        else:
+            lit(c)
+            i += 1
+        span = 1
+    word = re.compile(rf"[^\W\d_]{{{min_letters},}}")
+    return all(word.search(branch) for branch in "".join(literal).split("\n"))
+
+
+class RouteCache:
+    """Learned (regex -> table, INSERT) routes persisted next to the user's tables."""
+
+    def __init__(self, conn):
+        conn.execute(f"""CREATE TABLE IF NOT EXISTS {ROUTES_TABLE} (
+            pattern TEXT PRIMARY KEY, table_name TEXT, insert_sql TEXT, hits INTEGER DEFAULT 0)""")
+        self.routes = []
+        stale = []
+        for pattern, table, insert in conn.execute(f"SELECT pattern, table_name, insert_sql FROM {ROUTES_TABLE}"):
+            if not _has_anchor(pattern):
+                logger.warning(f"Dropping unanchored route for {table}: {pattern}")
+                stale.append((pattern,))
+                continue
+            try:
+                self.routes.append((re.compile(pattern), pattern, table, insert))
+            except re.error:
+                logger.warning(f"Dropping uncompilable route for {table}: {pattern}")
+        if stale:
+            conn.executemany(f"DELETE FROM {ROUTES_TABLE} WHERE pattern = ?", stale)
+            conn.commit()
+
+    def match(self, thought):
+        """(table, insert_sql, params, pattern) for the first matching route, else None."""
+        for regex, pattern, table, insert in self.routes:
+            m = regex.fullmatch(thought.strip())
+            if m and len(m.groups()) == _placeholders(insert):
+                return table, insert, tuple(g.strip() if g else g for g in m.groups()), pattern
+        return None
+
+    def learn(self, conn, group, thoughts, others=()):
+        """Store the group's pattern only if it is specific enough to trust.
+
+        It must come from at least MIN_ROUTE_ROWS thoughts, carry literal text
+        outside its capture groups, reproduce every row the LLM gave, and match
+        none of `others` (thoughts of the same batch routed to other groups).
+        """
+        pattern = group["pattern"]
+        if not pattern or len(group["items"]) < MIN_ROUTE_ROWS:
+            return False
+        if not _has_anchor(pattern):
+            logger.debug(f"Not learning route for {group['table_name']}, no literal anchor: {pattern}")
+            return False
+        try:
+            regex = re.compile(pattern)
+        except re.error:
+            return False
+        for i, row in zip(group["items"], group["rows"]):
+            m = regex.fullmatch(thoughts[i].strip())
+            if not m or [str(g).strip() for g in m.groups()] != [str(v).strip() for v in row]:
+                return False
+        if any(regex.fullmatch(t.strip()) for t in others):
+            logger.debug(f"Not learning route for {group['table_name']}, it also matches other groups: {pattern}")
+            return False
+        conn.execute(f"INSERT OR REPLACE INTO {ROUTES_TABLE} (pattern, table_name, insert_sql) VALUES (?, ?, ?)",
+                     (pattern, group["table_name"], group["insert_sql"]))
+        self.routes.append((regex, pattern, group["table_name"], group["insert_sql"]))
+        logger.info(f"Learned route for {group['table_name']}: {pattern}")
+        return True
+
+
+def capture_batch(db_name, thoughts, llm):
+    """Route and store `thoughts`. Returns a list of {table_name, count, explanation} summaries."""
+    thoughts = [t.strip() for t in thoughts if t and t.strip()]
+    with sqlite3.connect(db_name) as conn:
+        conn.isolation_level = None  # explicit BEGIN/COMMIT below
+        routes = RouteCache(conn)
+        cached, pending = {}, []
+        for t in thoughts:
+            hit = routes.match(t)
+            if hit:
+                table, insert, params, pattern = hit
+                cached.setdefault((table, insert, pattern), []).append(params)
+            else:
+                pending.append(t)
+        logger.info(f"Batch capture: {len(thoughts)} thoughts, {len(thoughts) - len(pending)} from route cache")
+
+        groups = []
+        for start in range(0, len(pending), CHUNK_SIZE):
+            chunk = pending[start:start + CHUNK_SIZE]
+            response_text = llm.chat([{"role": "user", "content": batch_prompt(chunk, describe_tables(conn))}],
+                                     json_mode=True)
+            plan = json.loads(re.search(r'\{.*\}', response_text, re.DOTALL).group())
+            existing = set(user_tables(conn)) | {g["table_name"] for g in groups}
+            assigned = []
+            for raw in plan.get("groups", []):
+                group = validate_group(raw, len(chunk), existing)
+                group["thoughts"] = chunk
+                existing.add(group["table_name"])
+                assigned += group["items"]
+                groups.append(group)
+            if sorted(assigned) != list(range(len(chunk))):
+                missing = sorted(set(range(len(chunk))) - set(assigned))
+                raise ValueError(f"Librarian plan must assign every thought exactly once (missing: {missing})")
+
+        # One transaction for everything: a bad row rolls the whole batch back.
+        summary = []
+        conn.execute("BEGIN")
+        try:
+            for (table, insert, pattern), rows in cached.items():
+                conn.executemany(insert, rows)
+                conn.execute(f"UPDATE {ROUTES_TABLE} SET hits = hits + ? WHERE pattern = ?", (len(rows), pattern))
+                summary.append({"table_name": table, "count": len(rows), "explanation": "route cache"})
+            for group in groups:
+                if group["new_table_sql"]:
+                    conn.execute(group["new_table_sql"])
+                conn.executemany(group["insert_sql"], group["rows"])
+                mine = {group["thoughts"][i] for i in group["items"]}
+                routes.learn(conn, group, group["thoughts"], [t for t in pending if t not in mine])
+                summary.append({"table_name": group["table_name"], "count": len(group["rows"]),
+                                "explanation": group["explanation"]})
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    return summary
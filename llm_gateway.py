@@ -0,0 +1,295 @@
+import os
+import math
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dotenv import load_dotenv
+from logger import logger
+
+load_dotenv()
+
+# Capabilities a caller can ask for. Each provider maps the ones it supports to a model.
+CHAT, JSON, VISION = "chat", "json", "vision"
+
+
+class LLMGatewayError(RuntimeError):
+    """Raised when every provider for a capability failed or the deadline ran out."""
+
+
+class ProviderStats:
+    """Rolling latency/error window for one provider."""
+
+    def __init__(self, window=50):
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)  # True = success
+        self.lock = threading.Lock()
+
+    def record(self, latency, ok):
+        with self.lock:
+            if ok:
+                self.latencies.append(latency)
+            self.outcomes.append(ok)
+
+    def p95(self):
+        with self.lock:
+            if len(self.latencies) < 5:
+                return None
+            ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+    def median(self):
+        with self.lock:
+            if not self.latencies:
+                return None
+            ordered = sorted(self.latencies)
+        return ordered[len(ordered) // 2]
+
+    def error_rate(self):
+        with self.lock:
+            if not self.outcomes:
+                return 0.0
+            return self.outcomes.count(False) / len(self.outcomes)
+
+
+class GroqProvider:
+    name = "groq"
+
+    def __init__(self, api_key, models=None):
+        from groq import Groq
+        self.client = Groq(api_key=api_key, max_retries=0)
+        self.models = models or {CHAT: "llama-3.1-8b-instant", JSON: "llama-3.1-8b-instant"}
+
+    def call(self, model, messages, json_mode, timeout):
+        kwargs = {"response_format": {"type": "json_object"}} if json_mode else {}
+        res = self.client.chat.completions.create(
+            messages=messages, model=model, timeout=timeout, **kwargs
+        )
+        return res.choices[0].message.content
+
+
+class GeminiProvider:
+    name = "gemini"
+
+    def __init__(self, api_key, models=None):
+        from google import genai
+        self.client = genai.Client(api_key=api_key)
+        self.models = models or {CHAT: "gemini-2.0-flash", JSON: "gemini-2.0-flash"}
+
+    def call(self, model, messages, json_mode, timeout):
+        # Gemini takes a flat prompt; the per-request timeout is in milliseconds.
+        prompt = "\n\n".join(m["content"] for m in messages)
+        config = {"http_options": {"timeout": int(timeout * 1000)}}
+        if json_mode:
+            config["response_mime_type"] = "application/json"
+        res = self.client.models.generate_content(model=model, contents=prompt, config=config)
+        return res.text
+
+
+class OllamaProvider:
+    name = "ollama"
+
+    def __init__(self, host=None, models=None, keep_alive=None):
+        import ollama
+        self.make_client = ollama.Client
+        self.host = host
+        self.keep_alive = keep_alive
+        self.models = models or {CHAT: "llama3", JSON: "llama3", VISION: "llama3.2-vision"}
+        self.clients = {}  # timeout bucket -> ollama.Client
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def bucket(timeout):
+        """Round a remaining-time budget up to a coarse step: 1s below 10s, 5s below 60s, then 30s."""
+        step = 1 if timeout < 10 else 5 if timeout < 60 else 30
+        return max(1, math.ceil(timeout / step) * step)
+
+    def client_for(self, timeout):
+        # ollama.Client.chat() takes no per-request timeout, so keep one client
+        # (and connection pool) per timeout bucket; a late or hedged call then
+        # gives up about when the caller's deadline does.
+        bucket = self.bucket(timeout)
+        with self.lock:
+            if bucket not in self.clients:
+                self.clients[bucket] = self.make_client(host=self.host, timeout=bucket)
+            return self.clients[bucket]
+
+    def call(self, model, messages, json_mode, timeout):
+        kwargs = {"format": "json"} if json_mode else {}
+        if self.keep_alive is not None:
+            kwargs["keep_alive"] = self.keep_alive
+        res = self.client_for(timeout).chat(model=model, messages=messages, **kwargs)
+        return res["message"]["content"]
+
+
+class LLMGateway:
+    """Routes chat calls across providers by capability and observed health.
+
+    Every call gets a deadline. If the first provider is still running past its
+    own p95 latency, a hedged duplicate goes to the next provider and whichever
+    answers first wins. Failures fall through the ranked list; the local
+    provider (Ollama) is always tried last as the failover.
+    """
+
+    def __init__(self, providers, fallback="ollama", deadline=30.0, hedge=True,
+                 min_hedge_delay=0.5, max_workers=8):
+        self.providers = {p.name: p for p in providers}
+        self.order = [p.name for p in providers]
+        self.fallback = fallback
+        self.deadline = deadline
+        self.hedge = hedge
+        self.min_hedge_delay = min_hedge_delay
+        self.stats = {name: ProviderStats() for name in self.providers}
+        self.max_workers = max_workers
+        self.inflight = 0  # submitted provider calls not finished yet, losers included
+        self.inflight_lock = threading.Lock()
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm")
+
+    def rank(self, capability):
+        """Providers supporting `capability`, healthiest and fastest first, fallback last."""
+        candidates = [n for n in self.order if capability in self.providers[n].models]
+
+        def score(name):
+            stats = self.stats[name]
+            median = stats.median()
+            # Untried providers keep their configured order behind measured ones; errors push a provider down.
+            return (stats.error_rate() > 0.5, median if median is not None else float("inf"))
+
+        ranked = sorted((n for n in candidates if n != self.fallback), key=score)
+        if self.fallback in candidates:
+            ranked.append(self.fallback)
+        return ranked
+
+    def _timed_call(self, name, capability, messages, json_mode, timeout):
+        provider = self.providers[name]
+        started = time.monotonic()
+        try:
+            out = provider.call(provider.models[capability], messages, json_mode, timeout)
+        except Exception:
+            self.stats[name].record(time.monotonic() - started, False)
+            raise
+        finally:
+            with self.inflight_lock:
+                self.inflight -= 1
+        self.stats[name].record(time.monotonic() - started, True)
+        return out
+
+    def chat(self, messages, capability=CHAT, json_mode=False, deadline=None):
+        """Return the text of the first successful completion within `deadline` seconds."""
+        if json_mode and capability == CHAT:
+            capability = JSON
+        ranked = self.rank(capability)
+        if not ranked:
+            raise LLMGatewayError(f"No provider configured for '{capability}'")
+
+        end = time.monotonic() + (deadline or self.deadline)
+        queue = list(ranked)
+        running = {}
+        errors = []
+
+        def launch():
+            name = queue.pop(0)
+            remaining = max(0.1, end - time.monotonic())
+            with self.inflight_lock:
+                self.inflight += 1
+                busy = self.inflight
+            if busy > self.max_workers:
+                logger.warning(f"🧵 LLM pool saturated ({busy} calls for {self.max_workers} workers); "
+                               f"{name} call will queue")
+            fut = self.pool.submit(self._timed_call, name, capability, messages, json_mode, remaining)
+            running[fut] = name
+            logger.debug(f"🛰️ LLM call -> {name} ({capability}, {remaining:.1f}s left)")
+
+        launch()
+        hedged = False
+        while running:
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                break
+            wait_for = remaining
+            if self.hedge and not hedged and queue and len(running) == 1:
+                p95 = self.stats[next(iter(running.values()))].p95()
+                if p95 is not None:
+                    wait_for = min(remaining, max(self.min_hedge_delay, p95))
+
+            done, _ = wait(running, timeout=wait_for, return_when=FIRST_COMPLETED)
+            if not done:
+                if self.hedge and not hedged and queue and len(running) == 1:
+                    hedged = True
+                    logger.warning(f"⏱️ {next(iter(running.values()))} past p95, hedging to {queue[0]}")
+                    launch()
+                continue
+
+            for fut in done:
+                name = running.pop(fut)
+                try:
+                    result = fut.result()
+                except Exception as e:
+                    errors.append(f"{name}: {e}")
+                    logger.warning(f"⚠️ LLM provider {name} failed: {e}")
+                    continue
+                # Losers keep running in the pool but are bounded by their own timeout.
+                return result
+
+            if not running and queue:
+                launch()
+
+        if not errors:
+            errors.append("deadline exceeded")
+        raise LLMGatewayError(f"All providers failed for '{capability}': {'; '.join(errors)}")
+
+    def snapshot(self):
+        """Per-provider health for logging/diagnostics."""
+        return {
+            name: {"p95": s.p95(), "median": s.median(), "error_rate": s.error_rate()}
+            for name, s in self.stats.items()
+        }
+
+
+def build_gateway(groq_api_key=None, gemini_api_key=None, ollama_host=None, ollama_keep_alive=None,
+                  deadline=None):
+    """Build a gateway from whatever credentials the environment provides."""
+    providers = []
+    deadline = deadline or float(os.getenv("LLM_DEADLINE_SECONDS", "30"))
+    groq_api_key = groq_api_key or os.getenv("GROQ_API_KEY")
+    gemini_api_key = gemini_api_key or os.getenv("GEMINI_API_KEY")
+
+    if groq_api_key:
+        try:
+            providers.append(GroqProvider(groq_api_key))
+        except Exception as e:
+            logger.error(f"❌ Failed to initialize Groq provider: {e}")
+    if gemini_api_key:
+        try:
+            providers.append(GeminiProvider(gemini_api_key))
+        except Exception as e:
+            logger.error(f"❌ Failed to initialize Gemini provider: {e}")
+    try:
+        providers.append(OllamaProvider(
+            host=ollama_host or os.getenv("OLLAMA_HOST"),
+            keep_alive=ollama_keep_alive or os.getenv("OLLAMA_KEEP_ALIVE"),
+        ))
+    except Exception as e:
+        logger.error(f"❌ Failed to initialize Ollama provider: {e}")
+
+    gateway = LLMGateway(
+        providers,
+        deadline=deadline,
+        hedge=os.getenv("LLM_HEDGE", "1") != "0",
+        max_workers=int(os.getenv("LLM_MAX_WORKERS", "8")),
+    )
+    logger.info(f"🛰️ LLM gateway ready: {', '.join(gateway.order) or 'no providers'}")
+    return gateway
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway():
+    """Process-wide gateway, built on first use."""
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = build_gateway()
+        return _gateway
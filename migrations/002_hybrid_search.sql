@@ -0,0 +1,29 @@
+-- Migration: Full-text columns for hybrid (lexical + vector) search
+-- Run this in Supabase SQL Editor (Dashboard > SQL Editor) after 001_enable_pgvector.sql
+
+-- 1. thoughts: generated tsvector over content
+ALTER TABLE thoughts
+ADD COLUMN IF NOT EXISTS fts tsvector
+GENERATED ALWAYS AS (to_tsvector('english', coalesce(content, ''))) STORED;
+
+-- 2. GIN index so `fts @@ query` is an index seek, not a sequential scan
+CREATE INDEX IF NOT EXISTS thoughts_fts_idx ON thoughts USING gin (fts);
+
+-- 3. interactions: same treatment
+ALTER TABLE interactions
+ADD COLUMN IF NOT EXISTS fts tsvector
+GENERATED ALWAYS AS (to_tsvector('english', coalesce(content, ''))) STORED;
+
+CREATE INDEX IF NOT EXISTS interactions_fts_idx ON interactions USING gin (fts);
+
+-- 4. files_in_void: file name weighted above body text so title lookups win
+ALTER TABLE files_in_void
+ADD COLUMN IF NOT EXISTS fts tsvector
+GENERATED ALWAYS AS (
+    setweight(to_tsvector('english', coalesce(name, '')), 'A') ||
+    setweight(to_tsvector('english', coalesce(content, '')), 'B')
+) STORED;
+
+CREATE INDEX IF NOT EXISTS files_in_void_fts_idx ON files_in_void USING gin (fts);
+
+-- Done! Query with: WHERE fts @@ websearch_to_tsquery('english', 'exact name 2025')
@@ -0,0 +1,23 @@
+-- Migration: Indexes for time- and metadata-filtered vector search
+-- Run this in Supabase SQL Editor (Dashboard > SQL Editor) after 002_hybrid_search.sql
+
+-- 1. B-tree indexes for created_at range filters ("last month", "since June")
+CREATE INDEX IF NOT EXISTS thoughts_created_at_idx ON thoughts (created_at);
+CREATE INDEX IF NOT EXISTS interactions_created_at_idx ON interactions (created_at);
+CREATE INDEX IF NOT EXISTS files_in_void_created_at_idx ON files_in_void (created_at);
+
+-- 2. GIN index on thoughts.metadata for containment predicates
+--    e.g. metadata @> '{"source_type": "dairy_entry"}' or '{"is_processed": false}'
+CREATE INDEX IF NOT EXISTS thoughts_metadata_idx ON thoughts USING gin (metadata jsonb_path_ops);
+
+-- 3. B-tree index for project-scoped thoughts (bridge.OrbBridge.log_thought)
+CREATE INDEX IF NOT EXISTS thoughts_project_id_idx ON thoughts (project_id);
+
+-- 4. Iterative HNSW scans (pgvector >= 0.8) so a filtered ANN query keeps
+--    scanning the graph until it has k matches instead of returning fewer.
+--    Scoped to the RPC the engine queries through, not the whole database.
+ALTER FUNCTION execute_sql(text) SET hnsw.iterative_scan = 'relaxed_order';
+ALTER FUNCTION execute_sql(text) SET hnsw.max_scan_tuples = 20000;
+ALTER FUNCTION execute_sql(text) SET hnsw.ef_search = 100;
+
+-- Done! Filtered searches now combine index seeks with the HNSW walk
@@ -0,0 +1,35 @@
+-- Migration (OPTIONAL, pick at most one 004_compact_vector_indexes_* file):
+-- binary-quantized HNSW indexes for first-pass ANN, ~32x smaller than vector_cosine_ops.
+-- Run this in Supabase SQL Editor (Dashboard > SQL Editor) after 003_filtered_search.sql
+-- Requires pgvector >= 0.7. The full vector(384) column stays as the source of truth
+-- and is used to re-rank the over-fetched candidates (see retrieval.py).
+-- Safe to re-run; run it again after 005_memory_tiering.sql to cover interaction_summaries.
+--
+-- Every extra HNSW index costs RAM and write time on each insert, so this adds only
+-- the binary index. Set BRAAV_VECTOR_INDEX=binary (see retrieval.py), check recall
+-- with: python vector_bench.py, then do step 2 to actually release memory.
+
+-- 1. binary-quantized index on every drawer that has an embedding
+DO $$
+DECLARE
+    t text;
+BEGIN
+    FOREACH t IN ARRAY ARRAY['thoughts', 'interactions', 'files_in_void', 'interaction_summaries'] LOOP
+        IF to_regclass(t) IS NOT NULL THEN
+            EXECUTE format('CREATE INDEX IF NOT EXISTS %I ON %I '
+                           'USING hnsw ((binary_quantize(embedding)::bit(384)) bit_hamming_ops) '
+                           'WITH (m = 16, ef_construction = 64)', t || '_embedding_bin_idx', t);
+        END IF;
+    END LOOP;
+END;
+$$;
+
+-- 2. FINAL STEP, once vector_bench.py shows acceptable recall for binary: drop the
+--    full-precision indexes. Until then this migration *adds* index memory.
+--    (BRAAV_VECTOR_INDEX=full needs them; switch it first.)
+-- DROP INDEX IF EXISTS thoughts_embedding_idx;
+-- DROP INDEX IF EXISTS interactions_embedding_idx;
+-- DROP INDEX IF EXISTS files_in_void_embedding_idx;
+-- DROP INDEX IF EXISTS interaction_summaries_embedding_idx;
+
+-- Done! Index sizes: SELECT indexrelname, pg_size_pretty(pg_relation_size(indexrelid)) FROM pg_stat_user_indexes;
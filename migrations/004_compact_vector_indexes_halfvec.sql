@@ -0,0 +1,35 @@
+-- Migration (OPTIONAL, pick at most one 004_compact_vector_indexes_* file):
+-- halfvec HNSW indexes for first-pass ANN, ~2x smaller than vector_cosine_ops.
+-- Run this in Supabase SQL Editor (Dashboard > SQL Editor) after 003_filtered_search.sql
+-- Requires pgvector >= 0.7. The full vector(384) column stays as the source of truth;
+-- these are expression indexes, so no data is duplicated and inserts need no changes.
+-- Safe to re-run; run it again after 005_memory_tiering.sql to cover interaction_summaries.
+--
+-- Every extra HNSW index costs RAM and write time on each insert, so this adds only
+-- the halfvec index. Set BRAAV_VECTOR_INDEX=halfvec (see retrieval.py), check recall
+-- with: python vector_bench.py, then do step 2 to actually release memory.
+
+-- 1. halfvec index on every drawer that has an embedding
+DO $$
+DECLARE
+    t text;
+BEGIN
+    FOREACH t IN ARRAY ARRAY['thoughts', 'interactions', 'files_in_void', 'interaction_summaries'] LOOP
+        IF to_regclass(t) IS NOT NULL THEN
+            EXECUTE format('CREATE INDEX IF NOT EXISTS %I ON %I '
+                           'USING hnsw ((embedding::halfvec(384)) halfvec_cosine_ops) '
+                           'WITH (m = 16, ef_construction = 64)', t || '_embedding_half_idx', t);
+        END IF;
+    END LOOP;
+END;
+$$;
+
+-- 2. FINAL STEP, once vector_bench.py shows acceptable recall for halfvec: drop the
+--    full-precision indexes. Until then this migration *adds* index memory.
+--    (BRAAV_VECTOR_INDEX=full needs them; switch it first.)
+-- DROP INDEX IF EXISTS thoughts_embedding_idx;
+-- DROP INDEX IF EXISTS interactions_embedding_idx;
+-- DROP INDEX IF EXISTS files_in_void_embedding_idx;
+-- DROP INDEX IF EXISTS interaction_summaries_embedding_idx;
+
+-- Done! Index sizes: SELECT indexrelname, pg_size_pretty(pg_relation_size(indexrelid)) FROM pg_stat_user_indexes;
@@ -0,0 +1,86 @@
+-- Migration: Hot/summary/archive tiers for chat memory
+-- Run this in Supabase SQL Editor (Dashboard > SQL Editor) after 003_filtered_search.sql (004 is optional)
+
+-- 1. Tag each chat turn with the session that produced it (brain.BraavBrain.session_id)
+ALTER TABLE interactions ADD COLUMN IF NOT EXISTS session_id text;
+CREATE INDEX IF NOT EXISTS interactions_session_id_idx ON interactions (session_id);
+
+-- 2. Summary tier: one embedded row per (session, topic) cluster of aged interactions
+CREATE TABLE IF NOT EXISTS interaction_summaries (
+    id bigint GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+    content text NOT NULL,
+    topic text,
+    session_id text,
+    period_start timestamptz,
+    period_end timestamptz,
+    source_count int,
+    created_at timestamptz DEFAULT now(),
+    embedding vector(384),
+    fts tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(topic, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(content, '')), 'B')
+    ) STORED
+);
+
+CREATE INDEX IF NOT EXISTS interaction_summaries_embedding_idx ON interaction_summaries
+USING hnsw (embedding vector_cosine_ops)
+WITH (m = 16, ef_construction = 64);
+CREATE INDEX IF NOT EXISTS interaction_summaries_fts_idx ON interaction_summaries USING gin (fts);
+CREATE INDEX IF NOT EXISTS interaction_summaries_period_idx ON interaction_summaries (period_start, period_end);
+
+-- 3. Archive tier: raw rows evicted from the hot table. Deliberately no vector index.
+CREATE TABLE IF NOT EXISTS interactions_archive (
+    id bigint PRIMARY KEY,
+    content text,
+    category text,
+    session_id text,
+    created_at timestamptz,
+    embedding vector(384),
+    summary_id bigint REFERENCES interaction_summaries (id),
+    archived_at timestamptz DEFAULT now()
+);
+
+-- 4. Write the summary and move its rows hot -> archive in one transaction
+--    (called by consolidator.py). `summary` is the summary row as JSON, or NULL
+--    to archive rows unsummarized. If none of the rows are still hot (another
+--    pass got there first) the summary is not kept, so retries never duplicate it.
+DROP FUNCTION IF EXISTS archive_interactions(bigint[], bigint);
+CREATE OR REPLACE FUNCTION archive_interactions(row_ids bigint[], summary jsonb DEFAULT NULL)
+RETURNS int
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    summary_row_id bigint;
+    moved int;
+BEGIN
+    IF summary IS NOT NULL THEN
+        INSERT INTO interaction_summaries
+            (content, topic, session_id, period_start, period_end, source_count, embedding)
+        VALUES (
+            summary->>'content',
+            summary->>'topic',
+            summary->>'session_id',
+            (summary->>'period_start')::timestamptz,
+            (summary->>'period_end')::timestamptz,
+            (summary->>'source_count')::int,
+            (summary->>'embedding')::vector
+        )
+        RETURNING id INTO summary_row_id;
+    END IF;
+
+    INSERT INTO interactions_archive (id, content, category, session_id, created_at, embedding, summary_id)
+    SELECT id, content, category, session_id, created_at, embedding, summary_row_id
+    FROM interactions WHERE id = ANY (row_ids)
+    ON CONFLICT (id) DO NOTHING;
+
+    DELETE FROM interactions WHERE id = ANY (row_ids);
+    GET DIAGNOSTICS moved = ROW_COUNT;
+
+    IF moved = 0 AND summary_row_id IS NOT NULL THEN
+        DELETE FROM interaction_summaries WHERE id = summary_row_id;
+    END IF;
+    RETURN moved;
+END;
+$$;
+
+-- Done! The hot interactions index now stays bounded by the consolidation policy
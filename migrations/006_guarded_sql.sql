@@ -0,0 +1,79 @@
+-- Migration: Read-only, time-limited RPCs for agent-generated SQL
+-- Run this in Supabase SQL Editor (Dashboard > SQL Editor) after 005_memory_tiering.sql
+-- Used by sql_guard.GuardedSQLExecutor instead of execute_sql.
+
+-- 1. Plan-only call for the EXPLAIN cost check. Nothing is executed.
+--    VOLATILE because Postgres refuses EXPLAIN inside a non-volatile function;
+--    transaction_read_only keeps it read-only all the same.
+CREATE OR REPLACE FUNCTION explain_sql(query_text text)
+RETURNS json
+LANGUAGE plpgsql
+VOLATILE
+SET statement_timeout = '2s'
+AS $$
+DECLARE
+    plan json;
+BEGIN
+    PERFORM set_config('transaction_read_only', 'on', true);
+    EXECUTE 'EXPLAIN (FORMAT JSON) ' || query_text INTO plan;
+    RETURN plan;
+END;
+$$;
+
+-- 2. Execution in a read-only transaction with a per-statement timeout.
+--    PostgREST applies the function's statement_timeout to the RPC transaction;
+--    tune it with: ALTER FUNCTION execute_readonly_sql(text) SET statement_timeout = '5s';
+CREATE OR REPLACE FUNCTION execute_readonly_sql(query_text text)
+RETURNS json
+LANGUAGE plpgsql
+STABLE
+SET statement_timeout = '5s'
+AS $$
+DECLARE
+    result json;
+BEGIN
+    PERFORM set_config('transaction_read_only', 'on', true);
+    EXECUTE format('SELECT coalesce(json_agg(t), ''[]''::json) FROM (%s) t', query_text) INTO result;
+    RETURN result;
+END;
+$$;
+
+-- 3. Same iterative-scan settings as execute_sql (see 003_filtered_search.sql)
+ALTER FUNCTION execute_readonly_sql(text) SET hnsw.iterative_scan = 'relaxed_order';
+ALTER FUNCTION execute_readonly_sql(text) SET hnsw.max_scan_tuples = 20000;
+ALTER FUNCTION execute_readonly_sql(text) SET hnsw.ef_search = 100;
+
+-- 4. Per-table write counters. Every process that caches query results (API
+--    workers, watcher, consolidator) compares these before serving a cache hit,
+--    so a write made anywhere invalidates results cached everywhere.
+CREATE TABLE IF NOT EXISTS table_versions (
+    table_name text PRIMARY KEY,
+    version bigint NOT NULL DEFAULT 0
+);
+
+CREATE OR REPLACE FUNCTION bump_table_version()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    INSERT INTO table_versions (table_name, version) VALUES (TG_TABLE_NAME, 1)
+    ON CONFLICT (table_name) DO UPDATE SET version = table_versions.version + 1;
+    RETURN NULL;
+END;
+$$;
+
+DO $$
+DECLARE
+    t text;
+BEGIN
+    FOREACH t IN ARRAY ARRAY['thoughts', 'interactions', 'files_in_void', 'interaction_summaries', 'query_logs'] LOOP
+        IF to_regclass(t) IS NOT NULL THEN
+            EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', t || '_version', t);
+            EXECUTE format('CREATE TRIGGER %I AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON %I '
+                           'FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version()', t || '_version', t);
+        END IF;
+    END LOOP;
+END;
+$$;
+
+-- Done! Generated SQL is now planned, cost-checked and run read-only with a timeout
@@ -0,0 +1,12 @@
+-- Migration: Make vision-extracted diary entries searchable
+-- Run this in Supabase SQL Editor (Dashboard > SQL Editor) after 006_guarded_sql.sql
+
+-- 1. Embedding of visual_extraction (written by vision_pipeline.VisionIngestPipeline)
+ALTER TABLE diary_logs ADD COLUMN IF NOT EXISTS embedding vector(384);
+
+-- 2. HNSW index for similarity search on diary entries
+CREATE INDEX IF NOT EXISTS diary_logs_embedding_idx ON diary_logs
+USING hnsw (embedding vector_cosine_ops)
+WITH (m = 16, ef_construction = 64);
+
+-- Done! Diary photos are now findable by meaning, not just filename
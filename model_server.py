@@ -0,0 +1,256 @@
+"""Shared out-of-process model server for the embedding and OCR models.
+
+One process owns SentenceTransformer (and EasyOCR, loaded on first use) and
+serves every API worker, watcher and script on the machine over a local
+socket (Unix socket, or a named pipe on Windows). Concurrent embed requests
+are coalesced into one batched `encode()` call. Embeddings come back as raw
+float32 bytes that the client wraps with `np.frombuffer`, so they are never
+pickled or copied element by element.
+
+Run:     python model_server.py
+Clients: set BRAAV_MODEL_SERVER=default (or an explicit socket/pipe address)
+         and use get_embedder() / get_ocr_reader() from this module.
+
+Messages are pickled, so only the owning user may talk to the server: the
+socket lives in a 0700 per-user directory, and both sides authenticate with a
+random key kept there in a 0600 file (or BRAAV_MODEL_SERVER_KEY, if set).
+"""
+import os
+import sys
+import queue
+import secrets
+import tempfile
+import threading
+from multiprocessing.connection import Listener, Client
+import numpy as np
+from dotenv import load_dotenv
+from logger import logger
+
+load_dotenv()
+
+MODEL_NAME = "all-MiniLM-L6-v2"
+
+
+def _check_private(path):
+    """Refuse a directory other local users could write into (socket squatting)."""
+    if sys.platform == "win32":
+        return
+    st = os.lstat(path)
+    if os.path.islink(path) or not os.path.isdir(path) or st.st_uid != os.getuid() or st.st_mode & 0o077:
+        raise PermissionError(f"{path} must be a directory owned by you with mode 0700")
+
+
+def private_dir():
+    """Per-user runtime directory (0700) holding the socket and the auth key."""
+    if sys.platform == "win32":
+        path = os.path.join(os.path.expanduser("~"), ".braav")
+    else:
+        base = os.getenv("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+        path = os.path.join(base, f"braav-{os.getuid()}")
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    _check_private(path)
+    return path
+
+
+def default_address():
+    if sys.platform == "win32":
+        # Pipes have no private directory; the mutual authkey handshake rejects impostors.
+        return r"\\.\pipe\braav-models"
+    return os.path.join(private_dir(), "models.sock")
+
+
+def _address_from_env():
+    address = os.getenv("BRAAV_MODEL_SERVER")
+    if address in ("1", "default"):
+        return default_address()
+    return address
+
+
+def _authkey(create=False):
+    """Shared secret for the connection handshake.
+
+    BRAAV_MODEL_SERVER_KEY wins; otherwise the server writes a random key to a
+    0600 file in private_dir() and clients read it from there.
+    """
+    key = os.getenv("BRAAV_MODEL_SERVER_KEY")
+    if key:
+        return key.encode()
+    path = os.path.join(private_dir(), "models.key")
+    if create and not os.path.exists(path):
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "w") as f:
+            f.write(secrets.token_hex(32))
+    with open(path) as f:
+        return f.read().strip().encode()
+
+
+class ModelServer:
+    def __init__(self, address=None, model_name=MODEL_NAME, max_batch=64, batch_window=0.005):
+        self.address = address or default_address()
+        self.model_name = model_name
+        self.max_batch = max_batch
+        self.batch_window = batch_window  # seconds to wait for more requests to join a batch
+        self.pending = queue.Queue()
+        self.ocr_reader = None
+        self.ocr_lock = threading.Lock()
+
+        from sentence_transformers import SentenceTransformer
+        self.embedder = SentenceTransformer(model_name)
+        logger.info(f"✅ Model server loaded {model_name}")
+
+    def _ensure_ocr_loaded(self):
+        with self.ocr_lock:
+            if self.ocr_reader is None:
+                logger.info("Loading EasyOCR (first use)...")
+                import easyocr
+                self.ocr_reader = easyocr.Reader(['en'])
+                logger.info("EasyOCR ready")
+            return self.ocr_reader
+
+    def _batcher(self):
+        """Coalesce queued embed requests into one encode() call."""
+        while True:
+            jobs = [self.pending.get()]
+            total = len(jobs[0]["texts"])
+            while total < self.max_batch:
+                try:
+                    job = self.pending.get(timeout=self.batch_window)
+                except queue.Empty:
+                    break
+                jobs.append(job)
+                total += len(job["texts"])
+
+            texts = [t for job in jobs for t in job["texts"]]
+            try:
+                vectors = self.embedder.encode(texts, batch_size=self.max_batch, convert_to_numpy=True)
+                vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+                start = 0
+                for job in jobs:
+                    end = start + len(job["texts"])
+                    job["result"] = vectors[start:end]
+                    start = end
+            except Exception as e:
+                logger.error(f"❌ Batched encode failed: {e}", exc_info=True)
+                for job in jobs:
+                    job["error"] = str(e)
+            for job in jobs:
+                job["done"].set()
+            logger.debug(f"🧮 Encoded batch of {len(texts)} texts from {len(jobs)} requests")
+
+    def _handle(self, conn):
+        try:
+            while True:
+                req = conn.recv()
+                op = req.get("op")
+                if op == "embed":
+                    job = {"texts": list(req["texts"]), "done": threading.Event()}
+                    self.pending.put(job)
+                    job["done"].wait()
+                    if "error" in job:
+                        conn.send({"ok": False, "error": job["error"]})
+                    else:
+                        conn.send({"ok": True, "shape": job["result"].shape})
+                        conn.send_bytes(job["result"])
+                elif op == "ocr":
+                    try:
+                        reader = self._ensure_ocr_loaded()
+                        results = reader.readtext(req["path"])
+                        conn.send({"ok": True, "results": [
+                            ([[float(x), float(y)] for x, y in box], text, float(conf))
+                            for box, text, conf in results
+                        ]})
+                    except Exception as e:
+                        conn.send({"ok": False, "error": str(e)})
+                elif op == "ping":
+                    conn.send({"ok": True, "model": self.model_name})
+                else:
+                    conn.send({"ok": False, "error": f"unknown op {op!r}"})
+        except (EOFError, OSError):
+            pass
+        finally:
+            conn.close()
+
+    def serve_forever(self):
+        if not self.address.startswith("\\\\"):
+            _check_private(os.path.dirname(os.path.abspath(self.address)))
+            if os.path.exists(self.address):
+                os.remove(self.address)  # stale socket from a previous run
+        threading.Thread(target=self._batcher, daemon=True, name="embed-batcher").start()
+        with Listener(self.address, authkey=_authkey(create=True)) as listener:
+            logger.info(f"🛰️ Model server listening on {self.address}")
+            while True:
+                try:
+                    conn = listener.accept()
+                except Exception as e:
+                    logger.warning(f"⚠️ Rejected model client: {e}")
+                    continue
+                threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+
+class ModelClient:
+    """Thin client with the subset of SentenceTransformer / easyocr.Reader API the engine uses."""
+
+    def __init__(self, address=None):
+        self.address = address or _address_from_env() or default_address()
+        self.lock = threading.Lock()
+        self.conn = None
+        self._call({"op": "ping"})
+
+    def _call(self, req, expect_array=False):
+        with self.lock:
+            for attempt in range(2):
+                try:
+                    if self.conn is None:
+                        self.conn = Client(self.address, authkey=_authkey())
+                    self.conn.send(req)
+                    reply = self.conn.recv()
+                    if not reply["ok"]:
+                        raise RuntimeError(f"Model server error: {reply['error']}")
+                    if expect_array:
+                        buf = self.conn.recv_bytes()
+                        return np.frombuffer(buf, dtype=np.float32).reshape(reply["shape"])
+                    return reply
+                except (EOFError, OSError):
+                    # Server restarted: reconnect once.
+                    self.conn = None
+                    if attempt:
+                        raise
+
+    def encode(self, sentences, **kwargs):
+        single = isinstance(sentences, str)
+        vectors = self._call({"op": "embed", "texts": [sentences] if single else list(sentences)},
+                             expect_array=True)
+        return vectors[0] if single else vectors
+
+    def readtext(self, path):
+        return self._call({"op": "ocr", "path": os.path.abspath(path)})["results"]
+
+
+def get_embedder(model_name=MODEL_NAME):
+    """Model-server client when BRAAV_MODEL_SERVER is set, otherwise an in-process model."""
+    address = _address_from_env()
+    if address:
+        try:
+            client = ModelClient(address)
+            logger.info(f"✅ Embeddings via model server ({address})")
+            return client
+        except Exception as e:
+            logger.warning(f"⚠️ Model server unavailable ({e}); loading {model_name} in-process")
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name)
+
+
+def get_ocr_reader():
+    """OCR via the model server when configured, otherwise an in-process EasyOCR reader."""
+    address = _address_from_env()
+    if address:
+        try:
+            return ModelClient(address)
+        except Exception as e:
+            logger.warning(f"⚠️ Model server unavailable ({e}); loading EasyOCR in-process")
+    import easyocr
+    return easyocr.Reader(['en'])
+
+
+if __name__ == "__main__":
+    ModelServer(address=_address_from_env()).serve_forever()
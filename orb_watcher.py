@@ -81,6 +81,7 @@ class DairyHandler(FileSystemEventHandler):
                 },
                 "created_at": datetime.datetime.utcnow().isoformat()
             }).execute()
+            self.brain.sql.invalidate("thoughts")
             logger.info(f"Dairy saved: {os.path.basename(file_path)}")
         except Exception as e:
             logger.error(f"DB Error: {e}", exc_info=True)
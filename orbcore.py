@@ -3,9 +3,8 @@ from tkinter import filedialog, scrolledtext
 import os, shutil, threading, time
 from dotenv import load_dotenv
 from logger import logger
+from ui_dispatch import UIDispatcher, BoundedLog
 
-# # Import your Brain class
-# from brain import BraavBrain
 # # Import the watch directory from your watcher script
 # from orb_watcher import OrbVoidHandler, DairyHandler, WATCH_DIR, DAIRY_WATCH_DIR
 # from watchdog.observers import Observer
@@ -27,6 +26,10 @@ class OrbApp:
             font=("Consolas", 10), insertbackground="white"
         )
         self.display.pack(pady=10, padx=10, fill=tk.BOTH, expand=True)
+        # Log lines are queued from any thread and drained in batches on the Tk thread
+        self.log = BoundedLog(self.display, max_lines=int(os.getenv("ORB_LOG_MAX_LINES", "2000")))
+        self.dispatcher = UIDispatcher(self.root, self.log.append_many)
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
         self.update_log(">>> System Initialized. Awaiting input...")
 
         # 2. THE INPUT AREA
@@ -54,40 +57,42 @@ class OrbApp:
                   bg="#007acc", fg="white", width=15).pack(side=tk.RIGHT, padx=5)
 
     def update_log(self, text):
-        self.display.config(state=tk.NORMAL)
-        self.display.insert(tk.END, f"\n{text}\n")
-        self.display.see(tk.END)
-        self.display.config(state=tk.DISABLED)
+        """Thread-safe: queue a line for the next UI tick."""
+        self.dispatcher.post(text)
+
+    def close(self):
+        self.dispatcher.shutdown()
+        self.root.destroy()
 
     def save_thought(self):
         val = self.entry.get("1.0", tk.END).strip()
         if val:
             logger.info(f"Saving thought: {val}")
-            # status = self.brain.log_stream(val)
-            # self.update_log(f"SYSTEM: {status}")
+            if self.brain:
+                self.dispatcher.submit(self._run_save, val, label="SYSTEM")
+            else:
+                self.update_log("SYSTEM: No brain attached, thought not saved.")
             self.entry.delete("1.0", tk.END)
 
+    def _run_save(self, val):
+        status = self.brain.log_stream(val)
+        self.update_log(f"SYSTEM: {status}")
+
     def process_query(self):
         val = self.entry.get("1.0", tk.END).strip()
         if val:
             self.update_log(f"USER: {val}")
             logger.info(f"Processing query: {val}")
             self.entry.delete("1.0", tk.END)
-            # Threading prevents the UI from freezing during AI reasoning
-            # threading.Thread(target=self._run_ai, args=(val,), daemon=True).start()
+            # The background worker keeps the UI responsive during AI reasoning
+            self.dispatcher.submit(self._run_ai, val, label="KERNEL")
 
     def _run_ai(self, val):
-        try:
-            # Step 1: Trigger the Agentic Loop
-            # res = self.brain.handle_query(val)
-            # # Step 2: Use .after to safely update UI from background thread
-            # self.root.after(0, lambda: self.update_log(f"ORB: {res}"))
-            pass
-        except Exception as e:
-            # FIX: Capture error string immediately to avoid NameError closure bug
-            error_str = str(e)
-            logger.error(f"Error in AI loop: {error_str}", exc_info=True)
-            self.root.after(0, lambda: self.update_log(f"KERNEL ERROR: {error_str}"))
+        if not self.brain:
+            self.update_log("SYSTEM: No brain attached.")
+            return
+        res = self.brain.handle_query(val)
+        self.update_log(f"ORB: {res}")
 
     def open_vision_dialog(self):
         """Pick a photo of your diary and send it to the Vision Hand"""
@@ -97,18 +102,14 @@ class OrbApp:
         if file_path:
             self.update_log(f"VISION: Analyzing {os.path.basename(file_path)}...")
             logger.info(f"Analyzing image: {file_path}")
-            # threading.Thread(target=self._run_vision, args=(file_path,), daemon=True).start()
+            self.dispatcher.submit(self._run_vision, file_path, label="VISION")
 
     def _run_vision(self, path):
-        try:
-            # # Calls the vision_swallow function we added to brain.py
-            # res = self.brain.vision_swallow(path)
-            # self.root.after(0, lambda: self.update_log(res))
-            pass
-        except Exception as e:
-            error_str = str(e)
-            logger.error(f"Error in vision loop: {error_str}", exc_info=True)
-            self.root.after(0, lambda: self.update_log(f"VISION ERROR: {error_str}"))
+        if not self.brain:
+            self.update_log("SYSTEM: No brain attached.")
+            return
+        res = self.brain.vision_swallow(path)
+        self.update_log(res)
 
 # def start_watcher(brain):
 #     def run_observer():
@@ -138,20 +139,25 @@ if __name__ == "__main__":
     logger.info("LAUNCHING ORB ENGINE (Simplified)")
     logger.info("=============================================")
     
-    # URL, KEY = os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY")
-    # if URL and KEY:
-    #     logger.info("Environment vars loaded")
-    #     my_brain = BraavBrain(URL, KEY)
-    #     logger.info("Brain initialized")
-        
-    #     logger.info("Starting file watchers...")
-    #     start_watcher(my_brain)
-    #     logger.info("Watchers active on ORB_VOID and ORB_DAIRY")
-    #     logger.info("=============================================")
-    #     logger.info("ORB READY | Tkinter window opening...")
-    #     logger.info("=============================================")
-        
-    app = OrbApp()
+    brain = None
+    URL, KEY = os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY")
+    if URL and KEY:
+        logger.info("Environment vars loaded")
+        try:
+            from brain import BraavBrain
+            brain = BraavBrain(URL, KEY)
+            logger.info("Brain initialized")
+        except Exception as e:
+            logger.error(f"Failed to initialize BraavBrain (UI runs without it): {e}", exc_info=True)
+
+        # logger.info("Starting file watchers...")
+        # start_watcher(brain)
+        # logger.info("Watchers active on ORB_VOID and ORB_DAIRY")
+    else:
+        logger.info("Missing SUPABASE_URL or SUPABASE_KEY in .env; UI runs without a brain")
+
+    logger.info("=============================================")
+    logger.info("ORB READY | Tkinter window opening...")
+    logger.info("=============================================")
+    app = OrbApp(brain)
     app.root.mainloop()
-    # else:
-    #     logger.info("Missing SUPABASE_URL or SUPABASE_KEY in .env")
\ No newline at end of file
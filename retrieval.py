@@ -0,0 +1,240 @@
+import datetime
+import json
+from logger import logger
+
+# Drawers that carry both an `embedding` and a generated `fts` column (see migrations/).
+SEARCHABLE_TABLES = ("thoughts", "interactions", "files_in_void", "interaction_summaries")
+
+# Hot drawer -> colder tier consulted when the hot drawer has too few close hits
+# (see migrations/005_memory_tiering.sql and consolidator.py).
+TIERS = {"interactions": "interaction_summaries"}
+
+# Which filter keys each drawer can honour. A drawer that can't apply a requested
+# filter is skipped rather than searched unfiltered.
+FILTERABLE = {
+    "thoughts": {"since", "until", "source_type", "is_processed", "project_id"},
+    "interactions": {"since", "until"},
+    "files_in_void": {"since", "until"},
+    "interaction_summaries": {"since", "until"},
+}
+FILTER_KEYS = ("since", "until", "source_type", "is_processed", "project_id")
+
+# (start, end) columns that date the *conversation* a row describes. Summaries are
+# written long after the chat, so their created_at says nothing about "last month".
+TIME_COLUMNS = {"interaction_summaries": ("period_start", "period_end")}
+
+EMBEDDING_DIM = 384
+
+# First-pass ANN expression per index mode; "full" uses the index from migration 001,
+# the compact modes need the matching migrations/004_compact_vector_indexes_<mode>.sql.
+# Compact modes over-fetch and re-rank on the full-precision `embedding`.
+INDEX_MODES = {
+    "full": "embedding <=> {vec}",
+    "halfvec": "embedding::halfvec({dim}) <=> {vec}::halfvec({dim})",
+    "binary": "binary_quantize(embedding)::bit({dim}) <~> binary_quantize({vec})::bit({dim})",
+}
+
+
+def sql_literal(value):
+    """Quote a Python string as a Postgres string literal."""
+    return "'" + str(value).replace("\x00", "").replace("'", "''") + "'"
+
+
+def vector_literal(embedding):
+    return f"'{[float(x) for x in embedding]}'::vector"
+
+
+def normalize_filters(raw):
+    """Validate planner-supplied filters; drop empty or malformed values.
+
+    Dates must be ISO-8601 (date or datetime). A date-only `until` is inclusive:
+    it becomes midnight of the following day, since filter_clause uses `<`.
+    Unknown keys are ignored.
+    """
+    clean = {}
+    for key in FILTER_KEYS:
+        value = (raw or {}).get(key)
+        if value in (None, "", "null"):
+            continue
+        try:
+            if key in ("since", "until"):
+                parsed = datetime.datetime.fromisoformat(str(value))
+                if key == "until" and len(str(value).strip()) == 10:  # YYYY-MM-DD
+                    parsed += datetime.timedelta(days=1)
+                clean[key] = parsed.isoformat()
+            elif key == "is_processed":
+                clean[key] = value if isinstance(value, bool) else str(value).lower() == "true"
+            else:
+                clean[key] = str(value)
+        except ValueError:
+            logger.warning(f"⚠️ Ignoring malformed filter {key}={value!r}")
+    return clean
+
+
+def filter_clause(filters, table=None):
+    """Build the SQL predicate for already-normalized filters ("TRUE" if none).
+
+    Rows spanning a period (see TIME_COLUMNS) match when the period overlaps the window.
+    """
+    preds = []
+    start_col, end_col = TIME_COLUMNS.get(table, ("created_at", "created_at"))
+    if "since" in filters:
+        preds.append(f"{end_col} >= {sql_literal(filters['since'])}::timestamptz")
+    if "until" in filters:
+        preds.append(f"{start_col} < {sql_literal(filters['until'])}::timestamptz")
+    contains = {k: filters[k] for k in ("source_type", "is_processed") if k in filters}
+    if contains:
+        # Containment is served by the jsonb_path_ops GIN index on metadata.
+        preds.append(f"metadata @> {sql_literal(json.dumps(contains))}::jsonb")
+    if "project_id" in filters:
+        preds.append(f"project_id = {sql_literal(filters['project_id'])}")
+    return " AND ".join(preds) or "TRUE"
+
+
+class HybridRetriever:
+    """Full-text + ANN search over the drawers, fused with Reciprocal Rank Fusion.
+
+    Both legs run in one statement through the `execute_sql` RPC. The lexical
+    leg ORs the question's lexemes (requiring every word of a natural-language
+    question almost never matches) and ranks `fts` hits with `ts_rank_cd`
+    (GIN index); the semantic leg walks the HNSW cosine index. The two rank
+    lists are merged so rows that score well on either side surface.
+    """
+
+    def __init__(self, db, embed, rrf_k=60, candidates=20, full_text_weight=1.0, semantic_weight=1.0,
+                 index_mode="full", rerank_factor=4, hot_max_distance=0.5):
+        if index_mode not in INDEX_MODES:
+            raise ValueError(f"Unknown index mode: {index_mode}")
+        self.db = db
+        self.embed = embed
+        self.rrf_k = rrf_k
+        self.candidates = candidates
+        self.full_text_weight = full_text_weight
+        self.semantic_weight = semantic_weight
+        self.index_mode = index_mode
+        self.rerank_factor = rerank_factor
+        self.hot_max_distance = hot_max_distance
+
+    def semantic_sql(self, table, vec, n, where="TRUE", index_mode=None):
+        """SELECT id, embedding for the `n` nearest rows, exactly ordered by cosine distance.
+
+        In compact modes the quantized index yields `n * rerank_factor` candidates,
+        which are then re-ranked on the full vectors.
+        """
+        mode = index_mode or self.index_mode
+        if mode == "full":
+            return f"""
+                SELECT id, embedding FROM {table}
+                WHERE {where}
+                ORDER BY embedding <=> {vec}
+                LIMIT {n}
+            """
+        first_pass = INDEX_MODES[mode].format(vec=vec, dim=EMBEDDING_DIM)
+        return f"""
+                SELECT id, embedding FROM (
+                    SELECT id, embedding FROM {table}
+                    WHERE {where}
+                    ORDER BY {first_pass}
+                    LIMIT {n * self.rerank_factor}
+                ) candidates
+                ORDER BY embedding <=> {vec}
+                LIMIT {n}
+            """
+
+    def build_sql(self, table, query, embedding, k, filters=None):
+        if table not in SEARCHABLE_TABLES:
+            raise ValueError(f"Table not searchable: {table}")
+        where = filter_clause(filters or {}, table)
+        vec = vector_literal(embedding)
+        text = sql_literal(query)
+        n = max(self.candidates, k)
+        return f"""
+            WITH semantic AS (
+                SELECT id, row_number() OVER (ORDER BY embedding <=> {vec}) AS rank_ix
+                FROM ({self.semantic_sql(table, vec, n, where)}) nearest
+            ),
+            lexical AS (
+                SELECT id, row_number() OVER (ORDER BY ts_rank_cd(fts, q) DESC) AS rank_ix
+                FROM {table}, CAST(replace(plainto_tsquery('english', {text})::text, '&', '|') AS tsquery) q
+                WHERE fts @@ q AND {where}
+                ORDER BY ts_rank_cd(fts, q) DESC
+                LIMIT {n}
+            )
+            SELECT t.content,
+                   t.embedding <=> {vec} AS distance,
+                   coalesce({self.semantic_weight} / ({self.rrf_k} + s.rank_ix), 0.0) +
+                   coalesce({self.full_text_weight} / ({self.rrf_k} + l.rank_ix), 0.0) AS score
+            FROM semantic s
+            FULL OUTER JOIN lexical l ON s.id = l.id
+            JOIN {table} t ON t.id = coalesce(s.id, l.id)
+            ORDER BY score DESC
+            LIMIT {k}
+        """
+
+    def search_table(self, table, query, embedding, k=3, filters=None):
+        try:
+            sql = self.build_sql(table, query, embedding, k, filters)
+            return self.db.rpc("execute_sql", {"query_text": sql}).execute().data or []
+        except Exception as e:
+            logger.warning(f"⚠️ Hybrid search failed on {table}: {e}")
+            return []
+
+    def search(self, query, tables=("thoughts", "interactions"), k=3, filters=None):
+        """Return {table: [rows]} with the top `k` fused hits per drawer.
+
+        `filters` (see normalize_filters) are pushed into both legs of the query.
+        Tiered drawers are searched hot-first; when fewer than `k` hot rows are
+        within `hot_max_distance`, the colder tier fills the remainder.
+        """
+        filters = normalize_filters(filters)
+        tables = [t for t in tables if set(filters) <= FILTERABLE[t]]
+        if not tables:
+            return {}
+        embedding = self.embed(query)
+        results = {}
+        for table in tables:
+            rows = self.search_table(table, query, embedding, k, filters)
+            results[table] = rows
+            cold = TIERS.get(table)
+            if cold and cold not in results:
+                close = sum(1 for r in rows if r.get("distance") is not None and r["distance"] <= self.hot_max_distance)
+                if close < k:
+                    results[cold] = self.search_table(cold, query, embedding, k - close, filters)
+        return results
+
+
+def check_sql(db, tables=SEARCHABLE_TABLES):
+    """Plan every generated hybrid statement with EXPLAIN; returns [(table, mode, error)].
+
+    search_table() swallows SQL errors and returns no rows, so a malformed
+    statement only shows up as silently empty context. Run after changing
+    build_sql/semantic_sql or applying a migration.
+    """
+    failures = []
+    embedding = [0.0] * (EMBEDDING_DIM - 1) + [1.0]
+    filters = normalize_filters({"since": "2026-01-01", "until": "2026-02-01"})
+    for mode in INDEX_MODES:
+        retriever = HybridRetriever(db, None, index_mode=mode)
+        for table in tables:
+            sql = retriever.build_sql(table, "what did I do last week", embedding, 3,
+                                      {k: v for k, v in filters.items() if k in FILTERABLE[table]})
+            try:
+                db.rpc("explain_sql", {"query_text": sql}).execute()
+            except Exception as e:
+                failures.append((table, mode, str(e)))
+    return failures
+
+
+if __name__ == "__main__":
+    import os
+    import sys
+    from dotenv import load_dotenv
+    from supabase import create_client
+
+    load_dotenv()
+    failures = check_sql(create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY")))
+    for table, mode, error in failures:
+        logger.error(f"❌ {table} [{mode}]: {error}")
+    if failures:
+        sys.exit(1)
+    logger.info(f"✅ Hybrid SQL plans for {len(SEARCHABLE_TABLES)} drawers x {len(INDEX_MODES)} index modes")
@@ -0,0 +1,136 @@
+"""Guarded execution of LLM-generated SQL.
+
+Statements are parsed with sqlglot (Postgres dialect), checked against the
+drawer allow-list, given a LIMIT, cost-checked with EXPLAIN and then run through
+the read-only, time-limited RPCs from migrations/006_guarded_sql.sql. Result
+sets are cached by the SQL that ran. A hit is served only while the
+`table_versions` counters of the tables it read are unchanged, so writes from any
+process (other API workers, the watcher, the consolidator) invalidate it.
+"""
+import os
+import re
+import time
+import threading
+from collections import OrderedDict
+import sqlglot
+from sqlglot import exp
+from logger import logger
+
+ALLOWED_TABLES = {"thoughts", "interactions", "files_in_void", "interaction_summaries", "query_logs"}
+
+# pgvector distance operators. sqlglot misreads them (`<=>` becomes MySQL's null-safe
+# equality, `<#>`/`<~>` fail to parse), so they are swapped for `<->` in the copy that
+# is validated, and the statement that runs is always the caller's original text.
+_VECTOR_OPS = re.compile(r"<=>|<#>|<\+>|<~>|<%>")
+
+_FORBIDDEN = (exp.Insert, exp.Update, exp.Delete, exp.Merge, exp.Create, exp.Drop,
+              exp.Alter, exp.Command, exp.Into, exp.TruncateTable)
+
+
+class SQLRejected(ValueError):
+    """The statement failed parsing, policy or cost checks."""
+
+
+def normalize_sql(raw_sql, allowed_tables=ALLOWED_TABLES, default_limit=50, max_limit=500):
+    """Validate one read-only SELECT and return (sql_to_run, tables_touched).
+
+    sqlglot only validates; the original text is what runs, with `LIMIT default_limit`
+    appended when missing and wrapped in a capped outer SELECT when the limit is
+    larger than `max_limit` or not a plain number.
+    """
+    text = raw_sql.strip().replace("```sql", "").replace("```", "").strip().rstrip(";").strip()
+    try:
+        statements = [s for s in sqlglot.parse(_VECTOR_OPS.sub("<->", text), read="postgres") if s is not None]
+    except sqlglot.errors.ParseError as e:
+        raise SQLRejected(f"FORBIDDEN: Unparseable SQL ({e.errors[0]['description'] if e.errors else e}).")
+    if len(statements) != 1:
+        raise SQLRejected("FORBIDDEN: Exactly one statement allowed.")
+
+    stmt = statements[0]
+    if not isinstance(stmt, exp.Query):
+        raise SQLRejected("FORBIDDEN: Only SELECT queries are allowed.")
+    if any(stmt.find_all(*_FORBIDDEN)):
+        raise SQLRejected("FORBIDDEN: Destructive SQL.")
+
+    ctes = {cte.alias_or_name for cte in stmt.find_all(exp.CTE)}
+    tables = {t.name for t in stmt.find_all(exp.Table)} - ctes
+    if not tables <= set(allowed_tables):
+        raise SQLRejected(f"FORBIDDEN: Unauthorized table access ({', '.join(sorted(tables - set(allowed_tables)))}).")
+
+    limit = stmt.args.get("limit")
+    if limit is None:
+        # Newline first, in case the text ends in a `--` comment.
+        return f"{text}\nLIMIT {default_limit}", tables
+    value = limit.expression
+    if not (isinstance(value, exp.Literal) and value.is_int and int(value.this) <= max_limit):
+        return f"SELECT * FROM (\n{text}\n) AS capped LIMIT {max_limit}", tables
+    return text, tables
+
+
+class GuardedSQLExecutor:
+    def __init__(self, db, max_cost=None, cache_ttl=None, cache_size=256):
+        self.db = db
+        self.max_cost = float(max_cost or os.getenv("BRAAV_SQL_MAX_COST", "25000"))
+        self.cache_ttl = float(cache_ttl or os.getenv("BRAAV_SQL_CACHE_TTL", "300"))
+        self.cache_size = cache_size
+        self.cache = OrderedDict()  # sql -> (expires_at, tables, versions, rows)
+        self.lock = threading.Lock()
+        self.versions_warned = False
+
+    def table_versions(self, tables):
+        """{table: write counter} from migration 006, or None if it can't be read."""
+        try:
+            rows = self.db.table("table_versions").select("table_name, version") \
+                .in_("table_name", sorted(tables)).execute().data or []
+        except Exception as e:
+            if not self.versions_warned:
+                self.versions_warned = True
+                logger.warning(f"⚠️ table_versions unavailable (migration 006 applied?), SQL cache disabled: {e}")
+            return None
+        versions = {t: 0 for t in tables}
+        versions.update({r["table_name"]: r["version"] for r in rows})
+        return versions
+
+    def explain_cost(self, sql):
+        plan = self.db.rpc("explain_sql", {"query_text": sql}).execute().data
+        return float(plan[0]["Plan"]["Total Cost"])
+
+    def execute(self, raw_sql):
+        """Validate, cost-check and run `raw_sql`; returns (normalized_sql, rows)."""
+        sql, tables = normalize_sql(raw_sql)
+
+        with self.lock:
+            hit = self.cache.get(sql)
+        # Read before running the query, so a write that lands in between makes the entry stale.
+        versions = self.table_versions(tables)
+        if hit and versions is not None and hit[0] > time.monotonic() and hit[2] == versions:
+            with self.lock:
+                if sql in self.cache:
+                    self.cache.move_to_end(sql)
+            logger.debug(f"💾 SQL cache hit: {sql[:60]}")
+            return sql, hit[3]
+
+        cost = self.explain_cost(sql)
+        if cost > self.max_cost:
+            raise SQLRejected(f"FORBIDDEN: Estimated cost {cost:.0f} exceeds ceiling {self.max_cost:.0f}. "
+                              "Filter on indexed columns (created_at, fts, metadata) or narrow the query.")
+
+        rows = self.db.rpc("execute_readonly_sql", {"query_text": sql}).execute().data or []
+        if versions is None:
+            return sql, rows  # no way to see other processes' writes, so don't cache
+        with self.lock:
+            self.cache[sql] = (time.monotonic() + self.cache_ttl, tables, versions, rows)
+            self.cache.move_to_end(sql)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return sql, rows
+
+    def invalidate(self, table):
+        """Drop this process's cached results that read `table` right away.
+
+        Other processes notice the write through `table_versions`.
+        """
+        with self.lock:
+            stale = [sql for sql, (_, tables, _, _) in self.cache.items() if table in tables]
+            for sql in stale:
+                del self.cache[sql]
@@ -1,6 +1,6 @@
 from flask import Flask, request, jsonify, render_template
 from flask_cors import CORS
-import requests
+from vibe_cache import VibeCache
 
 # We explicitly tell Flask to look for the 'templates' folder
 app = Flask(__name__, template_folder='templates')
@@ -15,6 +15,9 @@ MOOD_MAP = {
     "green": "acoustic"
 }
 
+# Warm local cache of Jamendo tracks per mood tag (see vibe_cache.py)
+vibes = VibeCache(set(MOOD_MAP.values())).start()
+
 @app.route('/')
 def home():
     return render_template('index.html')
@@ -24,19 +27,8 @@ def get_vibe():
     color = request.args.get('color', 'red').lower()
     tag = MOOD_MAP.get(color, "rock")
     
-    # Using 'fuzzytags' and 'boost' to ensure we always get popular results
-    params = {
-        "client_id": "709fa152", 
-        "format": "json",
-        "limit": 5,
-        "fuzzytags": tag,
-        "boost": "popularity_month"
-    }
-    
     try:
-        r = requests.get("https://api.jamendo.com/v3.0/tracks/", params=params)
-        data = r.json()
-        return jsonify(data.get('results', []))
+        return jsonify(vibes.get(tag))
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -0,0 +1,76 @@
+import queue
+import tkinter as tk
+from concurrent.futures import ThreadPoolExecutor
+from logger import logger
+
+
+class BoundedLog:
+    """Ring-buffer view over a (Scrolled)Text widget: keeps only the last `max_lines` lines."""
+
+    def __init__(self, widget, max_lines=2000):
+        self.widget = widget
+        self.max_lines = max_lines
+
+    def append_many(self, messages):
+        """Insert a batch with one state toggle, one trim and one scroll."""
+        if not messages:
+            return
+        self.widget.config(state=tk.NORMAL)
+        self.widget.insert(tk.END, "".join(f"\n{m}\n" for m in messages))
+        lines = int(self.widget.index("end-1c").split(".")[0])
+        if lines > self.max_lines:
+            self.widget.delete("1.0", f"{lines - self.max_lines + 1}.0")
+        self.widget.see(tk.END)
+        self.widget.config(state=tk.DISABLED)
+
+
+class UIDispatcher:
+    """Single background worker + thread-safe message queue for a Tk app.
+
+    Any thread may `post()` log lines; they are drained on the Tk thread every
+    `interval_ms` in batches of up to `batch_size`, so a flood of messages
+    costs one redraw per tick instead of one per line. Brain/vision jobs go
+    through `submit()` and run one at a time off the UI thread.
+    """
+
+    def __init__(self, root, sink, interval_ms=16, batch_size=200):
+        self.root = root
+        self.sink = sink
+        self.interval_ms = interval_ms
+        self.batch_size = batch_size
+        self.messages = queue.SimpleQueue()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="orb-worker")
+        self._tick = self.root.after(self.interval_ms, self._drain)
+
+    def post(self, text):
+        self.messages.put(text)
+
+    def submit(self, fn, *args, label="KERNEL"):
+        """Run `fn(*args)` on the worker; errors are logged and posted as `<label> ERROR`."""
+        def job():
+            try:
+                return fn(*args)
+            except Exception as e:
+                logger.error(f"Error in {label.lower()} job: {e}", exc_info=True)
+                self.post(f"{label} ERROR: {e}")
+        return self.executor.submit(job)
+
+    def _drain(self):
+        batch = []
+        try:
+            while len(batch) < self.batch_size:
+                batch.append(self.messages.get_nowait())
+        except queue.Empty:
+            pass
+        try:
+            if batch:
+                self.sink(batch)
+        except Exception as e:
+            logger.error(f"Error rendering {len(batch)} UI messages: {e}", exc_info=True)
+        finally:
+            # Always re-arm, or one bad message stops the pump for good.
+            self._tick = self.root.after(self.interval_ms, self._drain)
+
+    def shutdown(self):
+        self.root.after_cancel(self._tick)
+        self.executor.shutdown(wait=False, cancel_futures=True)
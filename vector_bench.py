@@ -0,0 +1,91 @@
+"""Recall/latency comparison of the full, halfvec and binary ANN index modes.
+
+Usage: python vector_bench.py [table] [queries] [k]
+
+Sample rows of `table` are used as queries. Each mode's top-k is compared
+against an exact (sequential scan) top-k, and index sizes are listed so
+the memory saving can be weighed against recall before switching
+BRAAV_VECTOR_INDEX or dropping the full-precision indexes. A compact mode
+whose 004_compact_vector_indexes_<mode>.sql isn't applied runs as a sequential
+scan, so only its recall is meaningful.
+"""
+import os
+import sys
+import time
+from dotenv import load_dotenv
+from supabase import create_client
+from model_server import get_embedder
+from retrieval import HybridRetriever, INDEX_MODES, SEARCHABLE_TABLES, vector_literal
+from logger import logger
+
+load_dotenv()
+
+
+def run_sql(db, sql):
+    return db.rpc("execute_sql", {"query_text": sql}).execute().data or []
+
+
+def exact_ids(db, table, vec, k):
+    # `+ 0` makes the sort key non-indexable, forcing an exact scan as ground truth.
+    rows = run_sql(db, f"SELECT id FROM {table} ORDER BY (embedding <=> {vec}) + 0 LIMIT {k}")
+    return [r["id"] for r in rows]
+
+
+def bench(db, embedder, table="interactions", n_queries=20, k=10):
+    queries = [r["content"] for r in run_sql(
+        db, f"SELECT content FROM {table} WHERE content IS NOT NULL ORDER BY random() LIMIT {n_queries}"
+    )]
+    if not queries:
+        logger.warning(f"⚠️ No rows in {table} to benchmark")
+        return {}
+
+    retriever = HybridRetriever(db, None)
+    vecs = [vector_literal(embedder.encode(q).tolist()) for q in queries]
+    truth = [set(exact_ids(db, table, vec, k)) for vec in vecs]
+
+    results = {}
+    for mode in INDEX_MODES:
+        hits, latencies = 0, []
+        for vec, expected in zip(vecs, truth):
+            sql = f"SELECT id FROM ({retriever.semantic_sql(table, vec, k, index_mode=mode)}) nearest"
+            started = time.perf_counter()
+            try:
+                got = {r["id"] for r in run_sql(db, sql)}
+            except Exception as e:
+                logger.error(f"❌ {mode} query failed (its 004_compact_vector_indexes_* migration applied?): {e}")
+                break
+            latencies.append(time.perf_counter() - started)
+            hits += len(got & expected)
+        if latencies:
+            latencies.sort()
+            results[mode] = {
+                "recall": hits / sum(len(t) for t in truth),
+                "p50_ms": latencies[len(latencies) // 2] * 1000,
+                "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000,
+            }
+    return results
+
+
+def index_sizes(db, table):
+    return run_sql(db, f"""
+        SELECT indexrelname AS index, pg_size_pretty(pg_relation_size(indexrelid)) AS size
+        FROM pg_stat_user_indexes WHERE relname = '{table}' AND indexrelname LIKE '%embedding%'
+        ORDER BY pg_relation_size(indexrelid) DESC
+    """)
+
+
+if __name__ == "__main__":
+    table = sys.argv[1] if len(sys.argv) > 1 else "interactions"
+    n_queries = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    k = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+    if table not in SEARCHABLE_TABLES:
+        sys.exit(f"Table must be one of {SEARCHABLE_TABLES}")
+
+    db = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"))
+    embedder = get_embedder()
+
+    logger.info(f"📏 Benchmarking {table}: {n_queries} queries, recall@{k}")
+    for mode, r in bench(db, embedder, table, n_queries, k).items():
+        logger.info(f"  {mode:8s} recall={r['recall']:.3f}  p50={r['p50_ms']:.1f}ms  p95={r['p95_ms']:.1f}ms")
+    for row in index_sizes(db, table):
+        logger.info(f"  {row['index']:40s} {row['size']}")
@@ -0,0 +1,130 @@
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from logger import logger
+
+JAMENDO_URL = os.getenv("JAMENDO_API_URL", "https://api.jamendo.com/v3.0/tracks/")
+JAMENDO_CLIENT_ID = os.getenv("JAMENDO_CLIENT_ID", "709fa152")
+
+
+class VibeCache:
+    """Per-tag Jamendo track cache with stale-while-revalidate.
+
+    All mood tags are prefetched at startup and refreshed in the background
+    before they expire, so `get()` is normally a dict lookup. A stale entry
+    is served (and refreshed asynchronously) when the upstream is slow or
+    down; only a tag that has never been fetched waits on the network.
+    Point JAMENDO_API_URL at a local stub server to test without Jamendo.
+    """
+
+    def __init__(self, tags, base_url=JAMENDO_URL, client_id=JAMENDO_CLIENT_ID,
+                 ttl=900, stale_ttl=86400, timeout=(2, 5), limit=5, retry_after=30):
+        self.tags = list(tags)
+        self.base_url = base_url
+        self.client_id = client_id
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.timeout = timeout  # (connect, read) seconds
+        self.limit = limit
+        self.retry_after = retry_after  # min seconds between background refreshes of one tag
+        self.entries = {}  # tag -> (fetched_at, tracks)
+        self.refreshing = set()
+        self.attempted = {}  # tag -> last background refresh start
+        self.lock = threading.Lock()
+        self.pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="vibe")
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=4,
+            max_retries=Retry(total=1, backoff_factor=0.2, status_forcelist=(502, 503, 504)),
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def fetch(self, tag):
+        # Using 'fuzzytags' and 'boost' to ensure we always get popular results
+        params = {
+            "client_id": self.client_id,
+            "format": "json",
+            "limit": self.limit,
+            "fuzzytags": tag,
+            "boost": "popularity_month",
+        }
+        r = self.session.get(self.base_url, params=params, timeout=self.timeout)
+        r.raise_for_status()
+        # Jamendo reports errors inside a 200 reply; an error envelope or an empty
+        # list must not replace tracks that were good a moment ago.
+        body = r.json()
+        headers = body.get("headers") or {}
+        if headers.get("status") != "success":
+            raise ValueError(f"Jamendo error {headers.get('code')}: {headers.get('error_message') or headers.get('status')}")
+        tracks = body.get("results") or []
+        if not tracks:
+            raise ValueError("Jamendo returned no tracks")
+        return tracks
+
+    def refresh(self, tag):
+        """Fetch `tag` and store it; on failure (including an error or empty reply) keep whatever is cached."""
+        try:
+            tracks = self.fetch(tag)
+            with self.lock:
+                self.entries[tag] = (time.monotonic(), tracks)
+            logger.debug(f"🎵 Vibe cache refreshed: {tag} ({len(tracks)} tracks)")
+            return tracks
+        except Exception as e:
+            logger.warning(f"⚠️ Jamendo fetch failed for {tag}, serving cache: {e}")
+            return None
+        finally:
+            with self.lock:
+                self.refreshing.discard(tag)
+
+    def refresh_async(self, tag):
+        now = time.monotonic()
+        with self.lock:
+            if tag in self.refreshing or now - self.attempted.get(tag, -self.retry_after) < self.retry_after:
+                return
+            self.refreshing.add(tag)
+            self.attempted[tag] = now
+        self.pool.submit(self.refresh, tag)
+
+    def get(self, tag):
+        """Tracks for `tag`. Raises LookupError only if it was never fetched and the upstream fails."""
+        with self.lock:
+            entry = self.entries.get(tag)
+        if entry:
+            age = time.monotonic() - entry[0]
+            if age >= self.ttl:
+                self.refresh_async(tag)
+            if age < self.stale_ttl:
+                return entry[1]
+
+        with self.lock:
+            self.refreshing.add(tag)
+        tracks = self.refresh(tag)
+        if tracks is None:
+            if entry:
+                return entry[1]
+            raise LookupError(f"No tracks cached for '{tag}' and Jamendo is unreachable")
+        return tracks
+
+    def start(self):
+        """Prefetch every tag now, then keep them warm on a daemon thread."""
+        for tag in self.tags:
+            self.refresh_async(tag)
+
+        def keep_warm():
+            while True:
+                time.sleep(self.ttl / 2)
+                now = time.monotonic()
+                with self.lock:
+                    due = [t for t in self.tags if now - self.entries.get(t, (0, None))[0] >= self.ttl / 2]
+                for tag in due:
+                    self.refresh_async(tag)
+
+        threading.Thread(target=keep_warm, daemon=True, name="vibe-prefetch").start()
+        logger.info(f"🎵 Vibe cache prefetching {len(self.tags)} mood tags")
+        return self
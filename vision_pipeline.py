@@ -0,0 +1,131 @@
+import io
+import os
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, ImageOps
+from llm_gateway import VISION
+from logger import logger
+
+DIARY_PROMPT = ("Analyze this for my personal diary. What is happening? "
+                "Summarize the mood and the activity in one punchy sentence for Macha.")
+
+
+def prepare_image(path, max_side=1120, quality=85):
+    """Downsize/normalize an image to RGB JPEG bytes no larger than `max_side` on either edge."""
+    with Image.open(path) as img:
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail((max_side, max_side))
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        buf = io.BytesIO()
+        img.save(buf, format="JPEG", quality=quality)
+    return buf.getvalue()
+
+
+class VisionIngestPipeline:
+    """Concurrent vision ingestion into `diary_logs`.
+
+    Images are normalized before inference, up to `concurrency` vision calls
+    run against local Ollama at once (match OLLAMA_NUM_PARALLEL on the server),
+    and finished rows are embedded and bulk-inserted every `batch_size` rows
+    or `flush_interval` seconds, whichever comes first. A batch that fails to
+    insert `max_retries` times is appended to `dead_letter` (JSONL) and dropped.
+    """
+
+    def __init__(self, db, llm, embedder, concurrency=2, batch_size=16, flush_interval=10.0,
+                 max_side=1120, deadline=120.0, prompt=DIARY_PROMPT, max_retries=3,
+                 dead_letter=os.path.join("logs", "diary_dead_letter.jsonl")):
+        self.db = db
+        self.llm = llm
+        self.embedder = embedder
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_side = max_side
+        self.deadline = deadline
+        self.prompt = prompt
+        self.max_retries = max_retries
+        self.dead_letter = dead_letter
+        self.executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="vision")
+        self.buffer = []  # (submitted_at, attempts, row)
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.processed = 0
+        self.stopped = threading.Event()
+        threading.Thread(target=self._flush_loop, daemon=True, name="vision-flush").start()
+
+    def submit(self, path):
+        """Queue an image; returns immediately so the watchdog thread never blocks."""
+        return self.executor.submit(self._process, path, time.monotonic())
+
+    def _process(self, path, submitted_at):
+        filename = os.path.basename(path)
+        try:
+            image = prepare_image(path, self.max_side)
+            description = self.llm.chat([{
+                "role": "user", "content": self.prompt, "images": [image],
+            }], capability=VISION, deadline=self.deadline)
+        except Exception as e:
+            logger.error(f"❌ Perception Error ({filename}): {e}")
+            return
+        with self.lock:
+            self.buffer.append((submitted_at, 0, {
+                "image_filename": filename,
+                "visual_extraction": description,
+                "macha_context": "Auto-ingested via Perception Kernel.",
+            }))
+            full = len(self.buffer) >= self.batch_size
+        logger.info(f"👁️ Perceived {filename}: {description[:60]}")
+        if full:
+            self.flush()
+
+    def flush(self):
+        with self.flush_lock:
+            with self.lock:
+                entries, self.buffer = self.buffer, []
+            if not entries:
+                return
+            rows = [row for _, _, row in entries]
+            try:
+                vectors = self.embedder.encode([r["visual_extraction"] for r in rows])
+                for row, vec in zip(rows, vectors):
+                    row["embedding"] = [float(x) for x in vec]
+                self.db.table("diary_logs").insert(rows).execute()
+            except Exception as e:
+                logger.error(f"❌ Failed to store {len(rows)} diary rows: {e}", exc_info=True)
+                retry = [(t, n + 1, row) for t, n, row in entries if n + 1 < self.max_retries]
+                expired = [row for _, n, row in entries if n + 1 >= self.max_retries]
+                if expired:
+                    self._dead_letter(expired, e)
+                with self.lock:
+                    self.buffer = retry + self.buffer  # retry on next flush
+                return
+            self.processed += len(rows)
+            # Throughput of this batch: oldest image's submit time -> stored.
+            minutes = max(time.monotonic() - min(t for t, _, _ in entries), 1e-6) / 60
+            logger.info(f"✅ Memory consolidated: {len(rows)} entries "
+                        f"({len(rows) / minutes:.1f} images/min, {self.processed} total)")
+
+    def _dead_letter(self, rows, error):
+        """Park rows that keep failing so they stop riding along with every new batch."""
+        try:
+            os.makedirs(os.path.dirname(self.dead_letter) or ".", exist_ok=True)
+            with open(self.dead_letter, "a", encoding="utf-8") as f:
+                for row in rows:
+                    f.write(json.dumps({k: v for k, v in row.items() if k != "embedding"}) + "\n")
+            logger.error(f"🪦 Gave up on {len(rows)} diary rows after {self.max_retries} attempts; "
+                         f"saved to {self.dead_letter}")
+        except OSError as io_err:
+            logger.error(f"🪦 Dropped {len(rows)} diary rows after {self.max_retries} attempts "
+                         f"({error}); dead-letter write failed: {io_err}")
+
+    def _flush_loop(self):
+        while not self.stopped.wait(self.flush_interval):
+            self.flush()
+
+    def close(self):
+        """Finish in-flight images and write everything still buffered."""
+        self.executor.shutdown(wait=True)
+        self.stopped.set()
+        self.flush()